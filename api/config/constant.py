@@ -18,3 +18,13 @@ REDDIT_SYSTEM_PROMPT = """You are an intelligent chatbot that answers to user's
 6. Make sure to suggest atleast one similar question to the user that can be asked based on the retrieved context.
 Chat History: {chat_history} \nQuestion: {question} \nContext: {context} \nAnswer:
 """
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an assistant about the Godot game engine. Update the existing summary with the new conversation turns below. Keep every detail that later questions may depend on: the user's goal, Godot version, node and class names, code snippets or errors being debugged, and the conclusions reached. Drop greetings and repetition. Keep the summary under {max_words} words and answer with the summary only.
+
+Existing summary: {summary}
+
+New turns:
+{turns}
+
+Updated summary:
+"""
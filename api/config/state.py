@@ -1,3 +1,5 @@
+import os
+
 from api.services.logger_service import LoggerService
 
 
@@ -25,6 +27,11 @@ class State(metaclass=SingletonMeta):
     logger = LoggerService.get_logger()
     embeddings = None
     vector_store = None
+    answer_cache = None
+    retrieval_cache = None
+    write_behind = None
+    lexical_index = None
+    symbol_index = None
 
     query_controller = None
     session_controller = None
@@ -44,11 +51,14 @@ class State(metaclass=SingletonMeta):
             from api.services.vector_store_factory import VectorStoreFactory
 
             emb = EmbeddingsFactory().get_embeddings(
-                "sentence-transformers", "intfloat/multilingual-e5-large-instruct"
+                "sentence-transformers",
+                "intfloat/multilingual-e5-large-instruct",
+                micro_batching=os.getenv("EMBEDDINGS_MICRO_BATCHING", "true").lower()
+                == "true",
             )
 
             vs = VectorStoreFactory().get_vectorstore(
-                vectorstore_service="astradb",
+                vectorstore_service=os.getenv("VECTOR_STORE_SERVICE", "astradb"),
                 embeddings=emb,
             )
             self.embeddings = emb
@@ -60,6 +70,93 @@ class State(metaclass=SingletonMeta):
             self.logger.error(f"Error initializing embeddings and vectorstore: {e}")
             raise
 
+    def initialize_caches(self):
+        try:
+            from api.services.cache_service import (
+                IndexGeneration,
+                RetrievalCache,
+                SemanticCache,
+            )
+
+            index_generation = None
+            if os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true":
+                retrieval_cache = RetrievalCache()
+                self.retrieval_cache = retrieval_cache
+                State.retrieval_cache = retrieval_cache
+                index_generation = retrieval_cache.index_generation
+                self.logger.info(
+                    "Retrieval cache enabled "
+                    f"(shared tier: {type(retrieval_cache.store).__name__})"
+                )
+            if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true":
+                # answers are dropped when any process bumps the generation
+                cache = SemanticCache(
+                    generation=(index_generation or IndexGeneration()).get
+                )
+                self.answer_cache = cache
+                State.answer_cache = cache
+                self.logger.info(
+                    f"Semantic answer cache enabled (threshold={cache.threshold}, "
+                    f"max_size={cache.max_size}, ttl={cache.ttl}s)"
+                )
+        except Exception as e:
+            self.logger.error(f"Error initializing caches: {e}")
+            raise
+
+    def initialize_write_behind(self):
+        try:
+            from api.services.persistence_service import WriteBehindQueue
+
+            if os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true":
+                queue = WriteBehindQueue()
+                self.write_behind = queue
+                State.write_behind = queue
+                self.logger.info(
+                    f"Write-behind persistence enabled (max_size={queue.max_size}, "
+                    f"batch_size={queue.batch_size})"
+                )
+        except Exception as e:
+            self.logger.error(f"Error initializing write-behind queue: {e}")
+            raise
+
+    def initialize_lexical_index(self):
+        try:
+            from api.services.lexical_index import BM25Index
+
+            if os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true":
+                index = BM25Index(
+                    path=os.getenv("BM25_INDEX_PATH", ".cache/bm25_index"),
+                    k1=float(os.getenv("BM25_K1", "1.2")),
+                    b=float(os.getenv("BM25_B", "0.75")),
+                )
+                self.lexical_index = index
+                State.lexical_index = index
+                self.logger.info(
+                    f"Hybrid search enabled (BM25 index with {len(index)} documents)"
+                )
+        except Exception as e:
+            self.logger.error(f"Error initializing lexical index: {e}")
+            raise
+
+    def initialize_symbol_index(self):
+        try:
+            from api.services.symbol_index import SymbolIndex
+
+            if os.getenv("SYMBOL_INDEX_ENABLED", "true").lower() == "true":
+                index = SymbolIndex(
+                    path=os.getenv("SYMBOL_INDEX_PATH", ".cache/symbol_index"),
+                    max_chunks=int(os.getenv("SYMBOL_MAX_CHUNKS", "3")),
+                    max_owners=int(os.getenv("SYMBOL_MAX_OWNERS", "3")),
+                )
+                self.symbol_index = index
+                State.symbol_index = index
+                self.logger.info(
+                    f"Symbol index enabled ({len(index)} class reference symbols)"
+                )
+        except Exception as e:
+            self.logger.error(f"Error initializing symbol index: {e}")
+            raise
+
     def initialize_controllers(self):
         """Lazily import and instantiate core controllers.
 
@@ -1,115 +1,237 @@
 import uuid
 from api.utils.rtd_reader import ReadTheDocsReader
 from api.utils.parqet_reader import ConversationsReader
+from api.utils.sitemap_reader import SitemapReader
 from api.models.sources import Source as SourceModel
-from tqdm import tqdm
 from api.config.state import State
+from api.services.cache_service import invalidate_index_caches
+from api.services.ingestion_manifest import IngestionManifest, ManifestDiff
+from api.services.ingestion_pipeline import IngestionPipeline
+from api.utils.chunk_ids import chunk_id
 
 
 class Ingestion:
     def __init__(self):
+        # ingestion usually runs offline, outside the server's lifespan, and
+        # must still build the local indexes next to the vector store
+        if State.lexical_index is None:
+            State().initialize_lexical_index()
+        if State.symbol_index is None:
+            State().initialize_symbol_index()
         self.rtd_loader = ReadTheDocsReader()
         self.conversationds_loader = ConversationsReader()
 
+    def __persist_indexes(self):
+        # embedded stores (e.g. the local one) keep new rows in memory until
+        # they are written out; remote stores persist on insert
+        if hasattr(State.vector_store, "persist"):
+            State.vector_store.persist()
+            State.logger.info("Persisted vector store index.")
+        if State.lexical_index is not None:
+            State.lexical_index.persist()
+            State.logger.info("Persisted BM25 index.")
+        if State.symbol_index is not None:
+            State.symbol_index.persist()
+            State.logger.info("Persisted symbol index.")
+
+    @staticmethod
+    def __with_ids(docs):
+        # the readers assign content-hash IDs; any other document gets one
+        # here, so the local indexes refer to the same chunks as the vector
+        # store and a retried batch overwrites instead of duplicating
+        for doc in docs:
+            if doc.id is None:
+                doc.id = chunk_id(doc)
+            yield doc
+
+    @staticmethod
+    def __new_summary():
+        return {
+            "count": 0,
+            "categories": set(),
+            "sub_categories": set(),
+            "sources": set(),
+            "tags": set(),
+        }
+
+    @staticmethod
+    def __summarize(docs, summary):
+        # collects the source summary while the documents stream past
+        for doc in docs:
+            metadata = doc.metadata
+            summary["count"] += 1
+            if "category" in metadata:
+                summary["categories"].add(metadata["category"])
+            if "sub_category" in metadata:
+                summary["sub_categories"].add(metadata["sub_category"])
+            if "source" in metadata:
+                summary["sources"].add(metadata["source"])
+            if "tags" in metadata and isinstance(metadata["tags"], list):
+                summary["tags"].update(metadata["tags"])
+            yield doc
+
+    def __embed_batch(self, documents):
+        texts = [doc.page_content for doc in documents]
+        if hasattr(State.vector_store, "add_embeddings"):
+            return State.embeddings.embed_documents(texts)
+        # other stores embed on insert; the vectors computed here are pinned
+        # in CachedEmbeddings until the batch is uploaded, so the LRU cannot
+        # evict them while the batch waits in the pipeline
+        if not hasattr(State.embeddings, "pin_documents"):
+            return None
+        vectors = State.embeddings.embed_documents(texts)
+        State.embeddings.pin_documents(texts, vectors)
+        return vectors
+
+    def __upload_batch(self, documents, vectors):
+        ids = [doc.id for doc in documents]
+        if vectors is not None and hasattr(State.vector_store, "add_embeddings"):
+            _ = State.vector_store.add_embeddings(
+                texts=[doc.page_content for doc in documents],
+                embeddings=vectors,
+                metadatas=[doc.metadata for doc in documents],
+                ids=ids,
+            )
+        elif vectors is not None:
+            texts = [doc.page_content for doc in documents]
+            try:
+                _ = State.vector_store.add_documents(documents=documents, ids=ids)
+            finally:
+                # a retried upload is served by the LRU, or embeds again
+                State.embeddings.unpin_documents(texts)
+        else:
+            _ = State.vector_store.add_documents(
+                documents=documents,
+                ids=ids,
+            )
+        if State.lexical_index is not None:
+            State.lexical_index.add_documents(documents, ids=ids)
+        if State.symbol_index is not None:
+            State.symbol_index.add_documents(documents, ids=ids)
+
+    def __delete_chunks(self, ids):
+        """Delete chunks by ID everywhere; returns the IDs that could not be."""
+        failed = []
+        batch_size = 500
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i : i + batch_size]
+            try:
+                State.vector_store.delete(ids=batch)
+            except Exception as e:
+                State.logger.error(f"Error deleting {len(batch)} stale chunks: {e}")
+                failed.extend(batch)
+        if State.lexical_index is not None:
+            State.lexical_index.delete(ids)
+        if State.symbol_index is not None:
+            State.symbol_index.delete(ids)
+        return failed
+
+    def __ingest(self, docs, name: str, desc: str, manifest=None, keep_sources=None):
+        """
+        Embed and upsert only the chunks that are new or changed since the
+        last ingestion of `name`, and delete the ones that vanished. Chunks
+        that fail stay out of the manifest, so the next run retries them.
+        """
+        manifest = manifest or IngestionManifest(name)
+        diff = ManifestDiff()
+        pipeline = IngestionPipeline(
+            embed=self.__embed_batch,
+            upload=self.__upload_batch,
+            desc=desc,
+        )
+        stats = pipeline.run(manifest.diff(self.__with_ids(docs), diff, keep_sources))
+        State.logger.info(
+            f"{name}: {len(diff.added)} new or changed chunks, "
+            f"{len(diff.unchanged)} unchanged, {len(diff.removed)} removed."
+        )
+        failed_deletes = self.__delete_chunks(diff.removed) if diff.removed else []
+
+        entries = {chunk: manifest.entries[chunk] for chunk in diff.unchanged}
+        entries.update({chunk: manifest.entries[chunk] for chunk in failed_deletes})
+        entries.update(
+            {
+                chunk: entry
+                for chunk, entry in diff.added.items()
+                if chunk not in pipeline.failed_ids
+            }
+        )
+        manifest.save(entries)
+        return {
+            **stats,
+            "unchanged": len(diff.unchanged),
+            "removed": len(diff.removed) - len(failed_deletes),
+            "failed_sources": {
+                diff.added[chunk].get("source") for chunk in pipeline.failed_ids
+            },
+        }
+
     def ingest_docs(self, directory: str, db):
         try:
             State.logger.info(f"Starting ingestion from {directory}")
-            docs = self.rtd_loader.load(directory=directory)
-            chunk_size = 100
-            total = len(docs)
+            summary = self.__new_summary()
+            # chunks stream from the reader's process pool into the pipeline
+            docs = self.__summarize(self.rtd_loader.lazy_load(directory=directory), summary)
+            stats = self.__ingest(
+                docs,
+                name=directory,
+                desc="Ingesting documents",
+                # pages that failed to parse keep their chunks from earlier runs
+                keep_sources=self.rtd_loader.failed_sources,
+            )
+            total = summary["count"]
             State.logger.info(f"Loaded {total} documents from {directory}")
-            total_chunks = (total + chunk_size - 1) // chunk_size
-            with tqdm(
-                total=total_chunks,
-                desc="Ingesting documents in 100 chunk sizes...",
-                unit="chunk",
-            ) as pbar:
-                for i in range(0, total, chunk_size):
-                    chunk = docs[i : i + chunk_size]
-                    _ = State.vector_store.add_documents(
-                        documents=chunk,
-                    )
-                    _ = pbar.update(1)
-
-            categories = set()
-            sub_categories = set()
-            sources = set()
-            tags = set()
-            for doc in docs:
-                metadata = doc.metadata
-                if "category" in metadata:
-                    categories.add(metadata["category"])
-                if "sub_category" in metadata:
-                    sub_categories.add(metadata["sub_category"])
-                if "source" in metadata:
-                    sources.add(metadata["source"])
-                if "tags" in metadata and isinstance(metadata["tags"], list):
-                    for tag in metadata["tags"]:
-                        tags.add(tag)
+            self.__persist_indexes()
+            invalidate_index_caches()
 
             source_entry = SourceModel(
                 source_id=str(uuid.uuid4()),
                 title="Godot Docs",
-                tags=list(tags),
-                sources=list(sources),
-                categories=list(categories),
-                sub_categories=list(sub_categories),
+                tags=list(summary["tags"]),
+                sources=list(summary["sources"]),
+                categories=list(summary["categories"]),
+                sub_categories=list(summary["sub_categories"]),
                 document_count=total,
             )
             db.add(source_entry)
             db.commit()
             State.logger.info(
-                f"Finished ingestion from {directory}, ingested {total} documents."
+                f"Finished ingestion from {directory}: {stats['uploaded']} of {total} "
+                f"documents upserted, {stats['unchanged']} unchanged, "
+                f"{stats['removed']} removed, {stats['failed']} failed, "
+                f"{len(self.rtd_loader.failed_sources)} pages failed to parse."
             )
         except Exception as e:
             State.logger.error(f"Error during ingestion: {e}")
 
     def ingest_conversations(self, dataset_name: str, db):
         try:
-            docs = self.conversationds_loader.load(dataset_name=dataset_name)
-            total = len(docs)
-            chunk_size = 100
+            summary = self.__new_summary()
+            docs = self.__summarize(
+                self.conversationds_loader.lazy_load(dataset_name=dataset_name), summary
+            )
+            stats = self.__ingest(
+                docs, name=dataset_name, desc="Ingesting conversations"
+            )
+            total = summary["count"]
             State.logger.info(f"Loaded conversations from {dataset_name}")
-
-            total_chunks = (total + chunk_size - 1) // chunk_size
-            with tqdm(
-                total=total_chunks,
-                desc="Ingesting conversations in 100 chunk sizes...",
-                unit="chunk",
-            ) as pbar:
-                for i in range(0, total, chunk_size):
-                    chunk = docs[i : i + chunk_size]
-                    _ = State.vector_store.add_documents(
-                        documents=chunk,
-                    )
-                    pbar.update(1)
-                    State.logger.info(f"Ingested {i+chunk_size}/{total} chunks.")
-            categories = set()
-            sub_categories = set()
-            sources = set()
-
-            for doc in docs:
-                metadata = doc.metadata
-                if "category" in metadata:
-                    categories.add(metadata["category"])
-                if "sub_category" in metadata:
-                    sub_categories.add(metadata["sub_category"])
-                if "source" in metadata:
-                    sources.add(metadata["source"])
+            self.__persist_indexes()
+            invalidate_index_caches()
             source_entry = SourceModel(
                 source_id=str(uuid.uuid4()),
                 title=dataset_name,
                 tags=[],
-                sources=list(sources),
-                categories=list(categories),
-                sub_categories=list(sub_categories),
+                sources=list(summary["sources"]),
+                categories=list(summary["categories"]),
+                sub_categories=list(summary["sub_categories"]),
                 document_count=total,
             )
             db.add(source_entry)
             db.commit()
 
             State.logger.info(
-                f"Finished ingestion of {dataset_name}, ingested {total} Conversations."
+                f"Finished ingestion of {dataset_name}: {stats['uploaded']} of {total} "
+                f"Conversations upserted, {stats['unchanged']} unchanged, "
+                f"{stats['removed']} removed, {stats['failed']} failed."
             )
         except Exception as e:
             State.logger.error(f"Error during ingestion: {e}")
@@ -117,10 +239,51 @@ class Ingestion:
     def ingest_from_sitemap(self, sitemap_url: str, db):
         try:
             State.logger.info(f"Starting ingestion from sitemap: {sitemap_url}")
-            total = 0
-            # TODO: Implement sitemap reader and ingestion logic
+            manifest = IngestionManifest(sitemap_url)
+            reader = SitemapReader(sitemap_url, splitter=self.rtd_loader)
+            summary = self.__new_summary()
+            docs = self.__summarize(
+                reader.lazy_load(known_sources=manifest.sources()), summary
+            )
+            stats = self.__ingest(
+                docs,
+                name=sitemap_url,
+                desc="Ingesting sitemap",
+                manifest=manifest,
+                keep_sources=reader.unchanged,
+            )
+            # pages whose chunks failed to upload are fetched in full next time
+            reader.save(exclude=stats["failed_sources"])
+            self.__persist_indexes()
+            invalidate_index_caches()
+
+            # pages that were not modified keep their chunks from earlier runs
+            for entry in manifest.entries.values():
+                if "category" in entry:
+                    summary["categories"].add(entry["category"])
+                if "sub_category" in entry:
+                    summary["sub_categories"].add(entry["sub_category"])
+                if "source" in entry:
+                    summary["sources"].add(entry["source"])
+            total = len(manifest.entries)
+            source_entry = SourceModel(
+                source_id=str(uuid.uuid4()),
+                title=sitemap_url,
+                tags=list(summary["tags"]),
+                sources=list(summary["sources"]),
+                categories=list(summary["categories"]),
+                sub_categories=list(summary["sub_categories"]),
+                document_count=total,
+            )
+            db.add(source_entry)
+            db.commit()
             State.logger.info(
-                f"Finished ingestion from sitemap: {sitemap_url}, ingested {total} documents."
+                f"Finished ingestion from sitemap: {sitemap_url}: "
+                f"{reader.stats['fetched']} pages fetched, "
+                f"{reader.stats['not_modified']} not modified, "
+                f"{reader.stats['failed']} failed; {stats['uploaded']} documents "
+                f"upserted, {stats['unchanged']} unchanged, "
+                f"{stats['removed']} removed, {stats['failed']} failed."
             )
         except Exception as e:
             State.logger.error(f"Error during ingestion from sitemap: {e}")
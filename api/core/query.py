@@ -1,7 +1,10 @@
+import asyncio
+import os
+import time
 import api.config.constant as constant
 
 from fastapi import HTTPException
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.schema import Document
 from langchain_core.prompts import (
@@ -10,17 +13,25 @@ from langchain_core.prompts import (
     HumanMessagePromptTemplate,
 )
 from langgraph.graph import START, StateGraph, END
+from langgraph.runtime import Runtime
 import api.config.constant as constant
 from api.config.state import State
 from api.core.tools import *
-from api.schema.ai_state import AIState
+from api.schema.ai_state import AIState, QueryContext
 from api.models.chat_session import ChatSession
+from api.services.context_service import ContextService
+from api.services.history_service import HistoryService
+from api.services.llm_factory import LLMFactory
+from api.services.memory_factory import MemoryFactory
+from api.utils.concurrency import gather_cancelling, run_blocking, timed
 
 
 class Query:
     def __init__(self):
         self.prompt = None
         self.reddit_prompt = None
+        self.graph = None
+        self.reddit_graph = None
 
         self.__initialize_query_pipeline()
         self.__initialize_reddit_query_pipeline()
@@ -39,6 +50,7 @@ class Query:
                     )
                 ],
             )
+            self.graph = self.__compile_graph(retrieve)
         except Exception as e:
             State.logger.error(f"Error initializing query pipeline: {e}")
             raise Exception(f"Error initializing query pipeline: {e}")
@@ -55,10 +67,176 @@ class Query:
                     )
                 ],
             )
+            self.reddit_graph = self.__compile_graph(retrieve_with_reddit)
         except Exception as e:
             State.logger.error(f"Error initializing Reddit query pipeline: {e}")
             raise Exception(f"Error initializing Reddit query pipeline: {e}")
 
+    @staticmethod
+    def __compile_graph(retriever):
+        """Compile a retrieve -> generate -> add_message_history graph once."""
+        graph_builder = StateGraph(AIState, context_schema=QueryContext).add_sequence(
+            [retriever, generate, add_message_history]
+        )
+        graph_builder.add_edge(START, retriever.__name__)
+        graph_builder.add_edge("add_message_history", END)
+        return graph_builder.compile()
+
+    async def __build_context(
+        self,
+        prompt: ChatPromptTemplate,
+        model_name: str,
+        temperature: float,
+        memory_service: str,
+        session_id: str,
+        vector_store=None,
+    ) -> QueryContext:
+        timings = {}
+        memory_instance, model = await gather_cancelling(
+            timed(
+                timings,
+                "memory_ms",
+                run_blocking(
+                    MemoryFactory.get_memory_instance,
+                    memory_service=memory_service,
+                    session_id=session_id,
+                ),
+            ),
+            timed(
+                timings,
+                "model_ms",
+                run_blocking(
+                    LLMFactory.get_chat_model,
+                    model_name=model_name,
+                    temperature=temperature,
+                ),
+            ),
+        )
+        State.logger.info(f"Context timings (ms): {timings}")
+        return QueryContext(
+            prompt=prompt,
+            model=model,
+            memory_instance=memory_instance,
+            vector_store=vector_store,
+        )
+
+    async def __load_memory(self, state: AIState):
+        memory_instance = await run_blocking(
+            MemoryFactory.get_memory_instance,
+            memory_service=state["memory_service"],
+            session_id=state["session_id"],
+        )
+        messages = await memory_instance.aget_messages()
+        chat_history = await HistoryService.abuild(state["session_id"], messages)
+        return memory_instance, messages, chat_history
+
+    def __resolve_symbols(self, state: AIState):
+        """
+        Pin the chunks of class reference symbols named in the question. They
+        replace the vector search (and the query embedding) with
+        SYMBOL_LOOKUP_MODE=replace, or with the default `auto` when the
+        question is a plain API lookup of at most SYMBOL_LOOKUP_MAX_WORDS
+        other words; `prepend` only puts them ahead of the search results.
+        """
+        state["pinned_context"], state["skip_search"] = [], False
+        if State.symbol_index is None:
+            return
+        if State.symbol_index.stale():
+            State.symbol_index.reload()
+        docs, other_words = State.symbol_index.resolve(
+            state["question"],
+            filter={
+                "category": state.get("category"),
+                "sub_category": state.get("sub_category"),
+            },
+        )
+        mode = os.getenv("SYMBOL_LOOKUP_MODE", "auto").lower()
+        state["pinned_context"] = docs
+        state["skip_search"] = bool(docs) and (
+            mode == "replace"
+            or (
+                mode == "auto"
+                and other_words <= int(os.getenv("SYMBOL_LOOKUP_MAX_WORDS", "4"))
+            )
+        )
+
+    async def __prepare(
+        self,
+        state: AIState,
+        prompt: ChatPromptTemplate,
+        vector_store=None,
+    ) -> Tuple[QueryContext, Optional[Dict]]:
+        """
+        Embed the question, load the memory instance and chat history, and
+        resolve the chat model concurrently, then consult the semantic answer
+        cache. The embedding, history and substage timings are written into
+        `state` so retrieval does not recompute them. Returns the run context
+        and the cached answer on a hit, otherwise None.
+        """
+        timings = {}
+        start = time.perf_counter()
+        self.__resolve_symbols(state)
+        timings["symbol_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        # an exact symbol lookup needs no embedding; sleep(0) resolves to None
+        embed = (
+            asyncio.sleep(0)
+            if state["skip_search"]
+            else timed(
+                timings, "embed_ms", State.embeddings.aembed_query(state["question"])
+            )
+        )
+        query_embedding, (memory_instance, messages, chat_history), model = (
+            await gather_cancelling(
+                embed,
+                timed(timings, "history_ms", self.__load_memory(state)),
+                timed(
+                    timings,
+                    "model_ms",
+                    run_blocking(
+                        LLMFactory.get_chat_model,
+                        model_name=state["model_name"],
+                        temperature=state["temperature"],
+                    ),
+                ),
+            )
+        )
+        State.logger.info(f"Prepare timings (ms): {timings}")
+        context = QueryContext(
+            prompt=prompt,
+            model=model,
+            memory_instance=memory_instance,
+            vector_store=vector_store,
+        )
+        state["timings"] = timings
+        state["query_embedding"] = query_embedding
+        state["chat_history"] = chat_history
+        # follow-up questions depend on the conversation, so only standalone
+        # questions are served from / stored in the answer cache
+        state["cacheable"] = (
+            State.answer_cache is not None
+            and not messages
+            and query_embedding is not None
+        )
+        if not state["cacheable"]:
+            return context, None
+        return context, await State.answer_cache.alookup(
+            query_embedding,
+            category=state.get("category"),
+            sub_category=state.get("sub_category"),
+            model_name=state.get("model_name"),
+        )
+
+    async def __cache_answer(self, state: AIState, answer: str, sources: List[Dict]):
+        if state.get("cacheable"):
+            await State.answer_cache.astore(
+                state["query_embedding"],
+                answer=answer,
+                sources=sources,
+                category=state.get("category"),
+                sub_category=state.get("sub_category"),
+                model_name=state.get("model_name"),
+            )
+
     def __flatten_sources(self, sources: List[Document]) -> List[Dict]:
         final_sources = []
         for source in sources:
@@ -85,7 +263,7 @@ class Query:
             )
         return final_sources
 
-    def generate_response(
+    async def generate_response(
         self,
         query: str,
         category: str = None,
@@ -98,42 +276,46 @@ class Query:
         db=None,
     ):
         try:
-            session = db.query(ChatSession).filter_by(session_id=session_id).first()
+            session = await db.get(ChatSession, session_id)
             if not session:
                 raise HTTPException(
                     status_code=404, detail=f"Session with id {session_id} not found."
                 )
-            graph_builder = StateGraph(AIState).add_sequence(
-                [retrieve, generate, add_message_history]
-            )
-            graph_builder.add_edge(START, "retrieve")
-            graph_builder.add_edge("retrieve", "generate")
-            graph_builder.add_edge("generate", "add_message_history")
-            graph_builder.add_edge("add_message_history", END)
-            graph = graph_builder.compile()
-
-            result = graph.invoke(
-                {
-                    "question": query,
-                    "session_id": session_id,
-                    "category": category,
-                    "sub_category": sub_category,
-                    "memory_service": memory_service,
-                    "model_name": model_name,
-                    "temperature": temperature,
-                    "top_k": top_k,
-                    "vector_store": State.vector_store,
-                    "prompt": self.prompt,
-                }
+            state = {
+                "question": query,
+                "session_id": session_id,
+                "category": category,
+                "sub_category": sub_category,
+                "memory_service": memory_service,
+                "model_name": model_name,
+                "temperature": temperature,
+                "top_k": top_k,
+            }
+            context, cached = await self.__prepare(
+                state, self.prompt, vector_store=State.vector_store
             )
+            if cached:
+                answer, sources = cached["answer"], cached["sources"]
+                await add_message_history(
+                    {"question": query, "answer": answer}, Runtime(context=context)
+                )
+            else:
+                result = await self.graph.ainvoke(state, context=context)
+                state["timings"] = result.get("timings")
+                state["token_usage"] = result.get("token_usage")
+                answer = result["answer"]
+                sources = self.__flatten_sources(sources=result["context"])
+                await self.__cache_answer(state, answer, sources)
 
-            message = State.message_controller.add_message(
-                db=db,
+            message = await State.message_controller.aqueue_message(
                 session_id=session_id,
-                content={"question": query, "answer": result["answer"]},
-                sources=self.__flatten_sources(sources=result["context"]),
+                content={"question": query, "answer": answer},
+                sources=sources,
+            )
+            State.logger.info(
+                f"Query timings (ms): {state.get('timings')}, "
+                f"tokens: {state.get('token_usage')}"
             )
-
             return message
         except HTTPException:
             raise
@@ -144,7 +326,236 @@ class Query:
                 "intermediate_steps": [],
             }
 
-    def generate_reddit_response(
+    async def stream_response(
+        self,
+        query: str,
+        category: str = None,
+        sub_category: str = None,
+        top_k: int = 4,
+        temperature: float = 0.0,
+        session_id: str = None,
+        model_name: str = None,
+        memory_service: str = "astradb",
+        db=None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Validate the session and return an async iterator of answer events:
+        one `sources` event, a `token` event per streamed chunk and a final
+        `done` event carrying the persisted message id.
+        """
+        session = await db.get(ChatSession, session_id)
+        if not session:
+            raise HTTPException(
+                status_code=404, detail=f"Session with id {session_id} not found."
+            )
+        state = {
+            "question": query,
+            "session_id": session_id,
+            "category": category,
+            "sub_category": sub_category,
+            "memory_service": memory_service,
+            "model_name": model_name,
+            "temperature": temperature,
+            "top_k": top_k,
+        }
+        context, cached = await self.__prepare(
+            state, self.prompt, vector_store=State.vector_store
+        )
+        return self.__stream_events(state, context, cached)
+
+    async def __stream_events(
+        self, state: AIState, context: QueryContext, cached: Optional[Dict]
+    ) -> AsyncIterator[Dict]:
+        try:
+            runtime = Runtime(context=context)
+            if cached:
+                sources, answer = cached["sources"], cached["answer"]
+                yield {"event": "sources", "data": sources}
+                yield {"event": "token", "data": answer}
+            else:
+                state.update(await retrieve(state, runtime))
+                state["context"], state["token_usage"] = ContextService.pack(
+                    state["context"],
+                    context.prompt,
+                    state["question"],
+                    state["chat_history"],
+                    LLMFactory.prompt_token_budget(state["model_name"]),
+                )
+                sources = self.__flatten_sources(sources=state["context"])
+                yield {"event": "sources", "data": sources}
+
+                messages = await context.prompt.ainvoke(
+                    {
+                        "question": state["question"],
+                        "context": "\n\n".join(
+                            doc.page_content for doc in state["context"]
+                        ),
+                        "chat_history": state["chat_history"],
+                    }
+                )
+                parts = []
+                async for chunk in context.model.astream(messages):
+                    if not chunk.content:
+                        continue
+                    parts.append(chunk.content)
+                    yield {"event": "token", "data": chunk.content}
+
+                answer = "".join(parts)
+                await self.__cache_answer(state, answer, sources)
+            state["answer"] = answer
+            await add_message_history(state, runtime)
+            message = await State.message_controller.aqueue_message(
+                session_id=state["session_id"],
+                content={"question": state["question"], "answer": answer},
+                sources=sources,
+            )
+            State.logger.info(
+                f"Query timings (ms): {state.get('timings')}, "
+                f"tokens: {state.get('token_usage')}"
+            )
+            yield {
+                "event": "done",
+                "data": {
+                    "message_id": message.message_id,
+                    "token_usage": state.get("token_usage"),
+                },
+            }
+        except Exception as e:
+            State.logger.error(f"Error in streamed response generation: {e}")
+            yield {"event": "error", "data": f"Error generating response {e}"}
+
+    async def batch_response(
+        self,
+        items: List[Dict],
+        model_name: str,
+        temperature: float = 0.0,
+        top_k: int = 4,
+        category: str = None,
+        sub_category: str = None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Answer independent queries without chat history. All questions are
+        embedded in one batched pass up front; the returned iterator then
+        yields one `result` (or `error`) event per query in completion order,
+        followed by a `done` event. Vector searches run concurrently, bounded
+        by BATCH_SEARCH_CONCURRENCY, and LLM calls share the provider's
+        concurrency limiter.
+        """
+        model, query_embeddings = await gather_cancelling(
+            run_blocking(
+                LLMFactory.get_chat_model,
+                model_name=model_name,
+                temperature=temperature,
+            ),
+            self.__embed_queries([item["query"] for item in items]),
+        )
+        context = QueryContext(
+            prompt=self.prompt,
+            model=model,
+            memory_instance=None,
+            vector_store=State.vector_store,
+        )
+        states = [
+            {
+                "question": item["query"],
+                "category": item.get("category") or category,
+                "sub_category": item.get("sub_category") or sub_category,
+                "model_name": model_name,
+                "temperature": temperature,
+                "top_k": item.get("top_k") or top_k,
+                "query_embedding": query_embedding,
+                "chat_history": "",
+                "cacheable": State.answer_cache is not None,
+                "timings": {},
+            }
+            for item, query_embedding in zip(items, query_embeddings)
+        ]
+        for state in states:
+            self.__resolve_symbols(state)
+        return self.__batch_events(items, states, context)
+
+    async def __embed_queries(self, queries: List[str]) -> List[List[float]]:
+        if hasattr(State.embeddings, "aembed_queries"):
+            return await State.embeddings.aembed_queries(queries)
+        return await asyncio.gather(
+            *(State.embeddings.aembed_query(query) for query in queries)
+        )
+
+    async def __batch_events(
+        self, items: List[Dict], states: List[AIState], context: QueryContext
+    ) -> AsyncIterator[Dict]:
+        runtime = Runtime(context=context)
+        search_limiter = asyncio.Semaphore(
+            int(os.getenv("BATCH_SEARCH_CONCURRENCY", "16"))
+        )
+        llm_limiter = LLMFactory.concurrency_limiter(states[0]["model_name"])
+        tasks = [
+            asyncio.create_task(
+                self.__answer_batch_item(
+                    index, item, state, runtime, search_limiter, llm_limiter
+                )
+            )
+            for index, (item, state) in enumerate(zip(items, states))
+        ]
+        errors = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event = await next_done
+                errors += event["event"] == "error"
+                yield event
+            yield {"event": "done", "data": {"count": len(tasks), "errors": errors}}
+        finally:
+            # the client may disconnect mid-batch
+            for task in tasks:
+                task.cancel()
+
+    async def __answer_batch_item(
+        self,
+        index: int,
+        item: Dict,
+        state: AIState,
+        runtime: Runtime[QueryContext],
+        search_limiter: asyncio.Semaphore,
+        llm_limiter: asyncio.Semaphore,
+    ) -> Dict:
+        try:
+            cached = None
+            if state["cacheable"]:
+                cached = await State.answer_cache.alookup(
+                    state["query_embedding"],
+                    category=state.get("category"),
+                    sub_category=state.get("sub_category"),
+                    model_name=state.get("model_name"),
+                )
+            if cached:
+                answer, sources = cached["answer"], cached["sources"]
+            else:
+                async with search_limiter:
+                    state.update(await retrieve(state, runtime))
+                async with llm_limiter:
+                    state.update(await generate(state, runtime))
+                answer = state["answer"]
+                sources = self.__flatten_sources(sources=state["context"])
+                await self.__cache_answer(state, answer, sources)
+            return {
+                "event": "result",
+                "data": {
+                    "index": index,
+                    "id": item.get("id"),
+                    "query": item["query"],
+                    "answer": answer,
+                    "sources": sources,
+                    "token_usage": state.get("token_usage"),
+                },
+            }
+        except Exception as e:
+            State.logger.error(f"Error answering batch query {index}: {e}")
+            return {
+                "event": "error",
+                "data": {"index": index, "id": item.get("id"), "error": str(e)},
+            }
+
+    async def generate_reddit_response(
         self,
         query: str,
         username: str,
@@ -157,22 +568,20 @@ class Query:
         db=None,
     ):
         try:
-            session = db.query(ChatSession).filter_by(session_id=session_id).first()
+            session = await db.get(ChatSession, session_id)
             if not session:
                 raise HTTPException(
                     status_code=404, detail=f"Session with id {session_id} not found."
                 )
 
-            graph_builder = StateGraph(AIState).add_sequence(
-                [retrieve_with_reddit, generate, add_message_history]
+            context = await self.__build_context(
+                prompt=self.reddit_prompt,
+                model_name=model_name,
+                temperature=temperature,
+                memory_service=memory_service,
+                session_id=session_id,
             )
-            graph_builder.add_edge(START, "retrieve_with_reddit")
-            graph_builder.add_edge("retrieve_with_reddit", "generate")
-            graph_builder.add_edge("generate", "add_message_history")
-            graph_builder.add_edge("add_message_history", END)
-            graph = graph_builder.compile()
-
-            result = graph.invoke(
+            result = await self.reddit_graph.ainvoke(
                 {
                     "question": query,
                     "session_id": session_id,
@@ -182,11 +591,10 @@ class Query:
                     "reddit_top_k": top_k,
                     "temperature": temperature,
                     "model_name": model_name,
-                    "prompt": self.reddit_prompt,
-                }
+                },
+                context=context,
             )
-            message = State.message_controller.add_message(
-                db=db,
+            message = await State.message_controller.aqueue_message(
                 session_id=session_id,
                 content={"question": query, "answer": result["answer"]},
                 sources=self.__flatten_reddit_sources(sources=result["context"]),
@@ -1,4 +1,6 @@
 from typing import Dict, List
+from api.config.state import State
+from api.database.database import AsyncSessionLocal
 from api.models.session_messages import SessionMessages
 from fastapi import HTTPException
 from datetime import datetime
@@ -47,6 +49,34 @@ class SessionMessage:
                 status_code=500, detail=str(f"Failed to add message: {e}")
             )
 
+    async def aqueue_message(self, session_id: str, content: Dict, sources: List):
+        """
+        Allocate the message id and return the message right away; the row is
+        inserted by the write-behind queue, or inline when it is disabled.
+        """
+        try:
+            values = {
+                "message_id": str(uuid4()),
+                "session_id": session_id,
+                "feedback": None,
+                "like": None,
+                "stars": 0,
+                "content": content,
+                "sources": sources,
+                "timestamp": datetime.utcnow(),
+            }
+            if State.write_behind is not None:
+                await State.write_behind.put_message(values)
+            else:
+                async with AsyncSessionLocal() as db:
+                    db.add(SessionMessages(**values))
+                    await db.commit()
+            return SessionMessages(**values)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500, detail=str(f"Failed to add message: {e}")
+            )
+
     def like_message(self, message_id: str, like: str, db):
         try:
             message = (
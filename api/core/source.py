@@ -1,5 +1,7 @@
 from api.config.state import State
 from api.models.sources import Source as SourceModel
+from api.services.cache_service import invalidate_index_caches
+from api.services.ingestion_manifest import IngestionManifest
 
 
 class Source:
@@ -24,6 +26,16 @@ class Source:
             deletion_count = State.vector_store.delete_by_metadata_filter(
                 filter=metadata_filter,
             )
+            if hasattr(State.vector_store, "persist"):
+                State.vector_store.persist()
+            if State.lexical_index is not None:
+                State.lexical_index.delete_by_metadata_filter(metadata_filter)
+                State.lexical_index.persist()
+            if State.symbol_index is not None:
+                State.symbol_index.delete_by_metadata_filter(metadata_filter)
+                State.symbol_index.persist()
+            IngestionManifest.prune(metadata_filter)
+            invalidate_index_caches()
             return deletion_count
         except Exception as e:
             State.logger.error(f"Error deleting documents: {e}")
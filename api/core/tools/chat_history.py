@@ -1,13 +1,32 @@
-from api.schema.ai_state import AIState
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.runtime import Runtime
+from api.schema.ai_state import AIState, QueryContext
 from api.config.state import State
+from api.services.history_service import HistoryService
+from api.services.memory_factory import CachedChatMessageHistory
 
 
-def add_message_history(state: AIState):
+async def add_message_history(state: AIState, runtime: Runtime[QueryContext]):
     try:
-        memory_instance = state.get("memory_instance")
-        memory_instance.add_user_message(state.get("question"))
-        memory_instance.add_ai_message(state.get("answer"))
-        return state
+        messages = [
+            HumanMessage(content=state.get("question")),
+            AIMessage(content=state.get("answer")),
+        ]
+        memory_instance = runtime.context.memory_instance
+        if State.write_behind is not None and isinstance(
+            memory_instance, CachedChatMessageHistory
+        ):
+            # the hot window is updated now, the backend write is deferred
+            memory_instance.append_window(messages)
+            await State.write_behind.put_history(memory_instance.backend, messages)
+        else:
+            await memory_instance.aadd_messages(messages)
+        HistoryService.schedule_update(
+            state.get("session_id"),
+            runtime.context.memory_instance,
+            state.get("model_name"),
+        )
+        return {}
     except Exception as e:
         State.logger.error(f"[AGENT] Error adding message history: {e}")
         raise Exception(f"[AGENT] Error adding message history: {e}")
@@ -1,21 +1,35 @@
-from api.schema.ai_state import AIState
+from langgraph.runtime import Runtime
+from api.schema.ai_state import AIState, QueryContext
 from api.config.state import State
+from api.services.context_service import ContextService
+from api.services.llm_factory import LLMFactory
 
 
-def generate(state: AIState):
+async def generate(state: AIState, runtime: Runtime[QueryContext]):
     try:
-        docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-        model = state.get("model")
-        messages = state.get("prompt").invoke(
+        docs, token_usage = ContextService.pack(
+            state["context"],
+            runtime.context.prompt,
+            state["question"],
+            state["chat_history"],
+            LLMFactory.prompt_token_budget(state["model_name"]),
+        )
+        State.logger.info(f"[AGENT] Prompt token usage: {token_usage}")
+        docs_content = "\n\n".join(doc.page_content for doc in docs)
+        messages = await runtime.context.prompt.ainvoke(
             {
                 "question": state["question"],
                 "context": docs_content,
                 "chat_history": state["chat_history"],
             }
         )
-        response = model.invoke(messages)
-        state["answer"] = response.content
-        return state
+        response = await runtime.context.model.ainvoke(messages)
+        # only the packed documents are reported as sources
+        return {
+            "answer": response.content,
+            "context": docs,
+            "token_usage": token_usage,
+        }
     except Exception as e:
         State.logger.error(f"[AGENT] Error in generation: {e}")
         raise Exception(f"[AGENT] Error in generation: {e}")
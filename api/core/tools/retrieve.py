@@ -1,65 +1,161 @@
-from langchain_core.messages import HumanMessage, AIMessage
-from api.schema.ai_state import AIState
-from api.services.llm_factory import LLMFactory
-from api.services.memory_factory import MemoryFactory
+import os
+from langgraph.runtime import Runtime
+from api.schema.ai_state import AIState, QueryContext
 from api.services.reddit import RedditClient
 from api.config.state import State
+from api.services.context_service import ContextService
+from api.services.history_service import HistoryService
+from api.services.lexical_index import reciprocal_rank_fusion
+from api.utils.concurrency import gather_cancelling, run_blocking, timed
 
+# each retriever returns top_k * HYBRID_FETCH_FACTOR candidates for fusion
+HYBRID_FETCH_FACTOR = int(os.getenv("HYBRID_FETCH_FACTOR", "2"))
+RRF_K = int(os.getenv("RRF_K", "60"))
 
-def _parse_and_flatten_memory(messages: list):
-    memory_string = ""
-    if not messages:
-        return memory_string
-    for message in messages:
-        if type(message) == HumanMessage:
-            memory_string += f"Human: {message.content}\n"
-        elif type(message) == AIMessage:
-            memory_string += f"Assistant: {message.content}\n\n"
-    return memory_string
 
+async def _search(
+    state: AIState, runtime: Runtime[QueryContext], clean_filter: dict, k: int = None
+):
+    vector_store = runtime.context.vector_store
+    # only the local store is persisted by other processes
+    if getattr(vector_store, "stale", None) and vector_store.stale():
+        await run_blocking(vector_store.reload)
+    k = k or state.get("top_k")
+    if state.get("query_embedding") is not None:
+        return await vector_store.asimilarity_search_by_vector(
+            state["query_embedding"],
+            k=k,
+            filter=clean_filter,
+        )
+    return await vector_store.as_retriever(
+        search_type="similarity",
+        search_kwargs={
+            "k": k,
+            "filter": clean_filter,
+        },
+    ).ainvoke(state["question"])
+
+
+async def _lexical_search(state: AIState, clean_filter: dict, k: int):
+    results = await run_blocking(
+        State.lexical_index.search, state["question"], k, clean_filter
+    )
+    return [doc for doc, _ in results]
+
+
+async def _hybrid_search(
+    state: AIState, runtime: Runtime[QueryContext], clean_filter: dict, timings: dict
+):
+    """
+    Vector and BM25 search run concurrently and are fused by reciprocal
+    rank, so exact identifiers (class and method names) that embed poorly
+    still surface. Falls back to vector search when there is no BM25 index.
+    """
+    lexical_index = State.lexical_index
+    if lexical_index is not None and lexical_index.stale():
+        await run_blocking(lexical_index.reload)
+    if lexical_index is None or not len(lexical_index):
+        return await _search(state, runtime, clean_filter)
+    top_k = state.get("top_k")
+    fetch_k = top_k * HYBRID_FETCH_FACTOR
+    vector_docs, lexical_docs = await gather_cancelling(
+        timed(timings, "vector_ms", _search(state, runtime, clean_filter, fetch_k)),
+        timed(timings, "lexical_ms", _lexical_search(state, clean_filter, fetch_k)),
+    )
+    return reciprocal_rank_fusion([vector_docs, lexical_docs], top_k, RRF_K)
+
+
+async def _cached_search(
+    state: AIState,
+    runtime: Runtime[QueryContext],
+    clean_filter: dict,
+    timings: dict,
+):
+    # the cache is an optimization: when its shared tier fails (Redis down,
+    # a locked SQLite file) the query is answered from the indexes
+    retrieval_cache = State.retrieval_cache
+    retrieved_docs = None
+    if retrieval_cache is not None:
+        try:
+            retrieved_docs = await retrieval_cache.aget(
+                state["question"], clean_filter, state.get("top_k")
+            )
+        except Exception as e:
+            State.logger.warning(f"Retrieval cache read failed: {e}")
+    if retrieved_docs is None:
+        retrieved_docs = await _hybrid_search(state, runtime, clean_filter, timings)
+        if retrieval_cache is not None:
+            try:
+                await retrieval_cache.aset(
+                    state["question"], clean_filter, state.get("top_k"), retrieved_docs
+                )
+            except Exception as e:
+                State.logger.warning(f"Retrieval cache write failed: {e}")
+    return retrieved_docs
+
+
+async def _pinned_search(
+    state: AIState,
+    runtime: Runtime[QueryContext],
+    clean_filter: dict,
+    timings: dict,
+):
+    pinned = state.get("pinned_context") or []
+    if state.get("skip_search"):
+        return pinned
+    retrieved_docs = await _cached_search(state, runtime, clean_filter, timings)
+    if not pinned:
+        return retrieved_docs
+    seen = {(doc.metadata.get("source"), doc.page_content) for doc in pinned}
+    merged = pinned + [
+        doc
+        for doc in retrieved_docs
+        if (doc.metadata.get("source"), doc.page_content) not in seen
+    ]
+    return merged[: max(state.get("top_k"), len(pinned))]
+
+
+async def _load_history(state: AIState, runtime: Runtime[QueryContext]):
+    return await HistoryService.abuild(
+        state.get("session_id"),
+        await runtime.context.memory_instance.aget_messages(),
+    )
 
-def retrieve(state: AIState):
+
+async def retrieve(state: AIState, runtime: Runtime[QueryContext]):
     try:
         filters = {
             "category": state.get("category"),
             "sub_category": state.get("sub_category"),
         }
         clean_filter = {k: v for k, v in filters.items() if v}
-        retrieved_docs = (
-            state.get("vector_store")
-            .as_retriever(
-                search_type="similarity",
-                search_kwargs={
-                    "k": state.get("top_k"),
-                    "filter": clean_filter,
-                },
+        timings = {}
+        chat_history = state.get("chat_history")
+        if chat_history is None:
+            retrieved_docs, chat_history = await gather_cancelling(
+                timed(
+                    timings,
+                    "search_ms",
+                    _pinned_search(state, runtime, clean_filter, timings),
+                ),
+                timed(timings, "history_ms", _load_history(state, runtime)),
             )
-            .get_relevant_documents(
-                query=state["question"],
+        else:
+            retrieved_docs = await timed(
+                timings, "search_ms", _pinned_search(state, runtime, clean_filter, timings)
             )
-        )
-
-        memory_instance = MemoryFactory().get_memory_instance(
-            memory_service=state.get("memory_service"),
-            session_id=state.get("session_id"),
-        )
-
-        chat_history = _parse_and_flatten_memory(memory_instance.messages)
-        model = LLMFactory.get_chat_model(
-            model_name=state.get("model_name"),
-            temperature=state.get("temperature", 0.0),
-        )
-        state["model"] = model
-        state["memory_instance"] = memory_instance
-        state["chat_history"] = chat_history
-        state["context"] = retrieved_docs
-        return state
+        State.logger.info(f"[AGENT] Retrieval timings (ms): {timings}")
+        return {
+            "chat_history": chat_history,
+            "context": ContextService.merge(retrieved_docs),
+            "timings": {**(state.get("timings") or {}), **timings},
+        }
     except Exception as e:
         State.logger.error(f"Error in retrieval: {e}")
         raise Exception(f"Error in retrieval: {e}")
 
 
-def retrieve_with_reddit(state: AIState):
+async def retrieve_with_reddit(state: AIState, runtime: Runtime[QueryContext]):
     try:
         user_agent = f"extractor by {state.get('username')}"
         reddit_loader = RedditClient(
@@ -69,27 +165,23 @@ def retrieve_with_reddit(state: AIState):
             k=state.get("reddit_top_k"), relevance=state.get("reddit_relevance")
         )
 
-        retrieved_docs = reddit_retriever._get_relevant_documents(
-            query=state["question"],
-        )
-
-        memory_instance = MemoryFactory().get_memory_instance(
-            memory_service=state.get("memory_service"),
-            session_id=state.get("session_id"),
+        # praw is a blocking client, keep it off the event loop; the history
+        # is fetched while the Reddit call is in flight
+        timings = {}
+        retrieved_docs, chat_history = await gather_cancelling(
+            timed(
+                timings,
+                "reddit_ms",
+                run_blocking(reddit_retriever.invoke, state["question"]),
+            ),
+            timed(timings, "history_ms", _load_history(state, runtime)),
         )
-
-        chat_history = _parse_and_flatten_memory(memory_instance.messages)
-        model = LLMFactory.get_chat_model(
-            model_name=state.get("model_name"),
-            temperature=state.get("temperature", 0.0),
-        )
-        state["reddit_retriever"] = reddit_retriever
-        state["reddit_loader"] = reddit_loader
-        state["model"] = model
-        state["memory_instance"] = memory_instance
-        state["chat_history"] = chat_history
-        state["context"] = retrieved_docs
-        return state
+        State.logger.info(f"[AGENT] Reddit retrieval timings (ms): {timings}")
+        return {
+            "chat_history": chat_history,
+            "context": retrieved_docs,
+            "timings": {**(state.get("timings") or {}), **timings},
+        }
     except Exception as e:
         State.logger.error(f"[AGENT] Error in Reddit retrieval: {e}")
         raise Exception(f"[AGENT] Error in Reddit retrieval: {e}")
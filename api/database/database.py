@@ -4,6 +4,8 @@ import logging
 # Ensure SQLite enforces foreign key constraints (so ON DELETE CASCADE works)
 from sqlalchemy import event
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.exc import OperationalError, DBAPIError, DisconnectionError
 
@@ -19,10 +21,33 @@ engine = create_engine(
 )
 
 
+def _async_database_uri(uri: str):
+    """Map the configured sync database URI onto its asyncio driver.
+
+    asyncpg does not understand libpq-only query parameters, so `sslmode` is
+    translated to `ssl` and `channel_binding` is dropped.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    query = dict(url.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    query.pop("channel_binding", None)
+    return url.set(drivername="postgresql+asyncpg", query=query)
+
+
+async_engine = create_async_engine(
+    _async_database_uri(os.getenv("POSTGRESQL_DATABASE_URI")),
+    pool_pre_ping=True,
+)
+
+
 url = os.getenv("POSTGRESQL_DATABASE_URI", "")
 if "sqlite" in url:
 
     @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
     def _set_sqlite_pragma(dbapi_connection, connection_record):
         try:
             cursor = dbapi_connection.cursor()
@@ -33,6 +58,9 @@ if "sqlite" in url:
 
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 
@@ -56,3 +84,14 @@ def get_db():
             raise DatabaseConnectionError(str(e)) from e
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except (OperationalError, DBAPIError, DisconnectionError) as e:
+            logging.getLogger("app.database").exception(
+                "Database operational error: %s", e
+            )
+            raise DatabaseConnectionError(str(e)) from e
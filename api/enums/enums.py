@@ -16,8 +16,10 @@ class LLMService(Enum):
 class VectorStoreService(Enum):
     MILVUS = "milvus"
     ASTRADB = "astradb"
+    LOCAL = "local"
 
 
 class MemoryService(Enum):
     UPSTASH = "upstash"
-    ASTRADB = "astradb"
\ No newline at end of file
+    ASTRADB = "astradb"
+    SQL = "sql"
\ No newline at end of file
@@ -7,5 +7,6 @@ relationships use fully-qualified string names like
 # declarative base when the package is imported.
 from . import chat_session  # noqa: F401
 from . import session_messages  # noqa: F401
+from . import session_summary  # noqa: F401
 
-__all__ = ["chat_session", "session_messages"]
+__all__ = ["chat_session", "session_messages", "session_summary"]
@@ -25,3 +25,9 @@ class ChatSession(Base):
         back_populates="session",
         cascade="all, delete-orphan",
     )
+    summary = relationship(
+        "SessionSummary",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        uselist=False,
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 
 class QueryState(BaseModel):
@@ -22,3 +22,19 @@ class QueryRequest(BaseModel):
 class QueryResponse(BaseModel):
     response: Dict[str, Any] = Field(..., description="Structured response from the query controller")
 
+
+class BatchQueryItem(BaseModel):
+    query: str = Field(..., description="User input query text", example="How do I create a Node in Godot?")
+    id: Optional[str] = Field(None, description="Caller supplied id echoed back with the result", example="q-1")
+    category: Optional[str] = Field(None, description="Optional retrieval category, overrides the batch default", example="docs")
+    sub_category: Optional[str] = Field(None, description="Optional retrieval sub-category, overrides the batch default", example="tutorials")
+    top_k: Optional[int] = Field(None, description="Number of documents to retrieve, overrides the batch default", example=5)
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchQueryItem] = Field(..., min_length=1, description="Queries to answer")
+    model_name: str = Field(..., description="LLM model name to use for every query", example="gemini-2.0-flash")
+    temperature: float = Field(0.7, description="Sampling temperature for the LLM", example=0.7)
+    top_k: int = Field(10, description="Default number of top documents to retrieve", example=10)
+    category: Optional[str] = Field(None, description="Default retrieval category", example="docs")
+    sub_category: Optional[str] = Field(None, description="Default retrieval sub-category", example="tutorials")
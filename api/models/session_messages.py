@@ -1,4 +1,4 @@
-from sqlalchemy import JSON, Column, ForeignKey, String, Integer, DateTime
+from sqlalchemy import JSON, Column, ForeignKey, Index, String, Integer, DateTime
 from sqlalchemy.orm import relationship
 import datetime
 from api.database.database import Base
@@ -7,6 +7,11 @@ from uuid import uuid4
 
 class SessionMessages(Base):
     __tablename__ = "session_messages"
+    # serves the ordered, bounded per-session history reads of the sql
+    # memory service
+    __table_args__ = (
+        Index("ix_session_messages_session_id_timestamp", "session_id", "timestamp"),
+    )
 
     message_id = Column(
         String, primary_key=True, nullable=False, index=True, default=str(uuid4())
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, DateTime
+from sqlalchemy.orm import relationship
+import datetime
+
+from api.database.database import Base
+
+
+class SessionSummary(Base):
+    __tablename__ = "session_summary"
+
+    session_id = Column(
+        String,
+        ForeignKey("chat_session.session_id", ondelete="CASCADE"),
+        primary_key=True,
+        nullable=False,
+    )
+    summary = Column(Text, nullable=False, default="")
+    # fingerprint of the newest turn folded into the summary
+    last_turn_hash = Column(String, nullable=True)
+    turns_summarized = Column(Integer, nullable=False, default=0)
+    time_updated = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow,
+    )
+
+    session = relationship("ChatSession", back_populates="summary")
@@ -1,15 +1,56 @@
+import json
+import os
+from typing import AsyncIterator, Dict, Literal
+
 from fastapi import APIRouter, Depends, HTTPException
-from api.models.models import QueryRequest, QueryResponse
+from fastapi.responses import StreamingResponse
+from api.models.models import BatchQueryRequest, QueryRequest, QueryResponse
 from api.config.state import State
-from api.database.database import get_db
+from api.database.database import get_async_db
+from api.services.llm_factory import LLMFactory
+from api.services.memory_factory import MemoryFactory
 
 router = APIRouter(tags=["Query"])
 
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+async def _encode_events(events: AsyncIterator[Dict], format: str):
+    async for event in events:
+        if format == "ndjson":
+            yield json.dumps(event) + "\n"
+        else:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+@router.get("/stats")
+async def query_stats():
+    return {
+        "answer_cache": State.answer_cache.stats() if State.answer_cache else None,
+        "retrieval_cache": (
+            State.retrieval_cache.stats() if State.retrieval_cache else None
+        ),
+        "embeddings": (
+            State.embeddings.stats() if hasattr(State.embeddings, "stats") else None
+        ),
+        "llm_clients": LLMFactory.pool_stats(),
+        "chat_memory": MemoryFactory.cache_stats(),
+        "write_behind": State.write_behind.stats() if State.write_behind else None,
+        "vector_store": (
+            State.vector_store.stats()
+            if hasattr(State.vector_store, "stats")
+            else None
+        ),
+    }
+
 
 @router.post("/")
-async def process_query(request: QueryRequest, db=Depends(get_db)):
+async def process_query(request: QueryRequest, db=Depends(get_async_db)):
     try:
-        response = State.query_controller.generate_response(
+        response = await State.query_controller.generate_response(
             query=request.query,
             category=request.state.category,
             sub_category=request.state.sub_category,
@@ -26,12 +67,69 @@ async def process_query(request: QueryRequest, db=Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/stream")
+async def stream_query(
+    request: QueryRequest,
+    format: Literal["sse", "ndjson"] = "sse",
+    db=Depends(get_async_db),
+):
+    try:
+        events = await State.query_controller.stream_response(
+            query=request.query,
+            category=request.state.category,
+            sub_category=request.state.sub_category,
+            model_name=request.state.model_name,
+            top_k=request.state.top_k,
+            session_id=request.session_id,
+            memory_service=request.state.memory_service,
+            temperature=request.state.temperature,
+            db=db,
+        )
+        return StreamingResponse(
+            _encode_events(events, format),
+            media_type=STREAM_MEDIA_TYPES[format],
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/batch")
+async def batch_query(request: BatchQueryRequest):
+    max_size = int(os.getenv("BATCH_QUERY_MAX_SIZE", "500"))
+    if len(request.queries) > max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch can hold at most {max_size} queries.",
+        )
+    try:
+        events = await State.query_controller.batch_response(
+            items=[item.model_dump() for item in request.queries],
+            model_name=request.model_name,
+            temperature=request.temperature,
+            top_k=request.top_k,
+            category=request.category,
+            sub_category=request.sub_category,
+        )
+        return StreamingResponse(
+            _encode_events(events, "ndjson"),
+            media_type=STREAM_MEDIA_TYPES["ndjson"],
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/reddit")
 async def process_reddit_query(
-    request: QueryRequest, db=Depends(get_db)
+    request: QueryRequest, db=Depends(get_async_db)
 ):
     try:
-        response = State.query_controller.generate_reddit_response(
+        response = await State.query_controller.generate_reddit_response(
             query=request.query,
             model_name=request.state.model_name,
             temperature=request.state.temperature,
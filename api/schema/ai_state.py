@@ -1,22 +1,24 @@
+from dataclasses import dataclass
 from langchain_core.documents import Document
 from typing_extensions import List, TypedDict
-from typing import Union
+from typing import Dict, Optional, Union
 from langchain_cohere.chat_models import ChatCohere
 from langchain_google_genai.chat_models import ChatGoogleGenerativeAI
 from langchain_mistralai.chat_models import ChatMistralAI
 from langchain_groq.chat_models import ChatGroq
-from langchain.memory.chat_message_histories.upstash_redis import (
-    UpstashRedisChatMessageHistory,
-)
-from langchain_astradb.chat_message_histories import AstraDBChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_milvus.vectorstores import Milvus
 from langchain_astradb import AstraDBVectorStore
 from langchain_core.prompts import ChatPromptTemplate
 
-from api.services.reddit import RedditClient, RedditRetriever
-
 
 class AIState(TypedDict):
+    """
+    Graph state. Only small, serializable per-request fields live here;
+    clients and other heavyweight dependencies are passed through
+    `QueryContext` instead so that node transitions stay cheap.
+    """
+
     question: str
     context: List[Document]
     chat_history: str
@@ -29,13 +31,27 @@ class AIState(TypedDict):
     model_name: str
     temperature: float
     top_k: int
-    model: Union[ChatCohere, ChatGoogleGenerativeAI, ChatMistralAI, ChatGroq]
-    memory_instance: Union[UpstashRedisChatMessageHistory, AstraDBChatMessageHistory]
-    vector_store: Union[AstraDBVectorStore, Milvus]
-    prompt: ChatPromptTemplate
+    query_embedding: Optional[List[float]]
+    # class reference chunks resolved by exact symbol lookup; they go ahead
+    # of the search results, or replace the search when `skip_search` is set
+    pinned_context: List[Document]
+    skip_search: bool
+    cacheable: bool
+    # per-substage wall times in milliseconds
+    timings: Dict[str, float]
+    # prompt tokens by part, as counted by the context packer
+    token_usage: Dict[str, int]
 
     reddit_username: str
     reddit_relevance: str
     reddit_top_k: int
-    reddit_loader: RedditClient
-    reddit_retriever: RedditRetriever
+
+
+@dataclass
+class QueryContext:
+    """Run-scoped dependencies injected into the graph nodes."""
+
+    prompt: ChatPromptTemplate
+    model: Union[ChatCohere, ChatGoogleGenerativeAI, ChatMistralAI, ChatGroq]
+    memory_instance: BaseChatMessageHistory
+    vector_store: Optional[Union[AstraDBVectorStore, Milvus]] = None
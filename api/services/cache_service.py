@@ -0,0 +1,497 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from api.config.state import State
+from api.utils.concurrency import run_blocking
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with optional TTL and hit/miss counters."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                stored_at, value = item
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            return default if item is _MISSING else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on the query embedding.
+
+    Entries are partitioned by (category, sub_category, model_name) and a
+    lookup returns the stored answer of the most similar cached question if
+    its cosine similarity reaches `threshold`. Eviction is LRU with a TTL and
+    a hard size cap.
+    """
+
+    def __init__(
+        self,
+        threshold: float = None,
+        max_size: int = None,
+        ttl: float = None,
+        generation: Callable[[], int] = None,
+    ):
+        self.threshold = (
+            threshold
+            if threshold is not None
+            else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        )
+        self.max_size = (
+            max_size
+            if max_size is not None
+            else int(os.getenv("SEMANTIC_CACHE_MAX_SIZE", "1024"))
+        )
+        self.ttl = ttl if ttl is not None else float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+        self.hits = 0
+        self.misses = 0
+        self._next_id = 0
+        # entry id -> (bucket, normalized vector, payload, stored_at)
+        self._entries: "OrderedDict[int, Tuple[Tuple, np.ndarray, Dict, float]]" = (
+            OrderedDict()
+        )
+        # bucket -> (entry ids, stacked vectors or None when stale)
+        self._buckets: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+        # the index generation the entries were answered from; answers of an
+        # older generation may cite chunks that changed or were deleted
+        self._generation = generation
+        self._entries_generation = None
+
+    @staticmethod
+    def _bucket(category: str, sub_category: str, model_name: str) -> Tuple:
+        return (category or "", sub_category or "", model_name or "")
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int):
+        bucket = self._entries.pop(entry_id)[0]
+        ids, _ = self._buckets[bucket]
+        ids.remove(entry_id)
+        if ids:
+            self._buckets[bucket] = [ids, None]
+        else:
+            del self._buckets[bucket]
+
+    def _check_generation(self):
+        if self._generation is None:
+            return
+        generation = self._generation()
+        if generation != self._entries_generation:
+            self._entries.clear()
+            self._buckets.clear()
+            self._entries_generation = generation
+
+    def _matrix(self, bucket: Tuple) -> Tuple[List[int], np.ndarray]:
+        ids, matrix = self._buckets[bucket]
+        if matrix is None:
+            matrix = np.stack([self._entries[i][1] for i in ids])
+            self._buckets[bucket] = [ids, matrix]
+        return ids, matrix
+
+    def lookup(
+        self,
+        embedding: List[float],
+        category: str = None,
+        sub_category: str = None,
+        model_name: str = None,
+    ) -> Optional[Dict]:
+        """Return `{"answer", "sources", "score"}` for a hit, otherwise None."""
+        bucket = self._bucket(category, sub_category, model_name)
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_generation()
+            if bucket in self._buckets:
+                # expired entries are dropped before scoring, so they can
+                # neither shadow a fresh match nor linger until evicted
+                now = time.monotonic()
+                for entry_id in list(self._buckets[bucket][0]):
+                    if now - self._entries[entry_id][3] >= self.ttl:
+                        self._remove(entry_id)
+            if bucket in self._buckets:
+                ids, matrix = self._matrix(bucket)
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                entry_id = ids[best]
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return {**self._entries[entry_id][2], "score": float(scores[best])}
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        embedding: List[float],
+        answer: str,
+        sources: List[Dict],
+        category: str = None,
+        sub_category: str = None,
+        model_name: str = None,
+    ):
+        bucket = self._bucket(category, sub_category, model_name)
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_generation()
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (
+                bucket,
+                vector,
+                {"answer": answer, "sources": sources},
+                time.monotonic(),
+            )
+            ids = self._buckets.get(bucket, [[], None])[0]
+            ids.append(entry_id)
+            self._buckets[bucket] = [ids, None]
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    async def alookup(
+        self,
+        embedding: List[float],
+        category: str = None,
+        sub_category: str = None,
+        model_name: str = None,
+    ) -> Optional[Dict]:
+        # the generation check may read the shared store
+        return await run_blocking(
+            self.lookup, embedding, category, sub_category, model_name
+        )
+
+    async def astore(
+        self,
+        embedding: List[float],
+        answer: str,
+        sources: List[Dict],
+        category: str = None,
+        sub_category: str = None,
+        model_name: str = None,
+    ):
+        await run_blocking(
+            self.store, embedding, answer, sources, category, sub_category, model_name
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SQLiteCacheStore:
+    """
+    File-backed shared cache tier. All uvicorn workers on a node that point
+    at the same file share entries and the index generation counter.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % 256 == 0:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE expires_at < ?", (time.time(),)
+                )
+
+    def get_generation(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'generation'"
+            ).fetchone()
+        return row[0] if row else 0
+
+    def bump_generation(self) -> int:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (name, value) VALUES ('generation', 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+            )
+            # entries of older generations can never be read again
+            self._conn.execute("DELETE FROM entries")
+            return self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'generation'"
+            ).fetchone()[0]
+
+
+class RedisCacheStore:
+    """Shared cache tier backed by Redis, shared across workers and nodes."""
+
+    def __init__(self, url: str, namespace: str = "retrieval"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        # the client connects lazily, so an unreachable server surfaces here
+        self._client.ping()
+        self._namespace = namespace
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(f"{self._namespace}:entry:{key}")
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self._client.set(f"{self._namespace}:entry:{key}", value, ex=int(ttl))
+
+    def get_generation(self) -> int:
+        value = self._client.get(f"{self._namespace}:generation")
+        return int(value) if value is not None else 0
+
+    def bump_generation(self) -> int:
+        return int(self._client.incr(f"{self._namespace}:generation"))
+
+
+def shared_cache_store():
+    """
+    The cache store shared by all workers: Redis when
+    RETRIEVAL_CACHE_REDIS_URL is set, otherwise a local SQLite file.
+    """
+    redis_url = os.getenv("RETRIEVAL_CACHE_REDIS_URL")
+    if redis_url:
+        try:
+            return RedisCacheStore(redis_url)
+        except Exception as e:
+            State.logger.warning(
+                f"Redis retrieval cache unavailable, falling back to SQLite: {e}"
+            )
+    return SQLiteCacheStore(
+        os.getenv("RETRIEVAL_CACHE_PATH", ".cache/retrieval_cache.sqlite3")
+    )
+
+
+class IndexGeneration:
+    """
+    The index generation counter kept in a shared cache store. Ingestion
+    and deletion bump it, from any process; readers re-read it at most every
+    RETRIEVAL_CACHE_GENERATION_REFRESH seconds.
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else shared_cache_store()
+        self._refresh = float(os.getenv("RETRIEVAL_CACHE_GENERATION_REFRESH", "1.0"))
+        self._value = None
+        self._read_at = 0.0
+
+    def get(self) -> int:
+        now = time.monotonic()
+        if self._value is None or now - self._read_at >= self._refresh:
+            self._value = self.store.get_generation()
+            self._read_at = now
+        return self._value
+
+    def bump(self) -> int:
+        self._value = self.store.bump_generation()
+        self._read_at = time.monotonic()
+        return self._value
+
+
+class RetrievalCache:
+    """
+    Two-tier cache for vector search results keyed on the normalized query,
+    the metadata filter and top_k.
+
+    The first tier is a per-process LRU, the second a store shared by all
+    workers (Redis when RETRIEVAL_CACHE_REDIS_URL is set, otherwise a local
+    SQLite file). Every key embeds the index generation, so bumping the
+    generation after ingestion or deletion invalidates both tiers at once.
+    """
+
+    def __init__(self, store=None, max_size: int = None, ttl: float = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("RETRIEVAL_CACHE_TTL", "86400"))
+        self.local = LRUCache(
+            max_size=(
+                max_size
+                if max_size is not None
+                else int(os.getenv("RETRIEVAL_CACHE_MAX_SIZE", "2048"))
+            ),
+            ttl=self.ttl,
+        )
+        self.store = store if store is not None else shared_cache_store()
+        self.index_generation = IndexGeneration(self.store)
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    @staticmethod
+    def key(query: str, filter: Dict, top_k: int) -> str:
+        normalized = " ".join(query.lower().split())
+        payload = json.dumps(
+            [normalized, sorted((filter or {}).items()), top_k], default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def generation(self) -> int:
+        return self.index_generation.get()
+
+    def get(self, query: str, filter: Dict, top_k: int) -> Optional[List]:
+        key = f"{self.generation()}:{self.key(query, filter, top_k)}"
+        docs = self.local.get(key)
+        if docs is not None:
+            return list(docs)
+        value = self.store.get(key)
+        if value is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        docs = [Document(**doc) for doc in json.loads(value)]
+        self.local.set(key, docs)
+        return list(docs)
+
+    def set(self, query: str, filter: Dict, top_k: int, docs: List):
+        key = f"{self.generation()}:{self.key(query, filter, top_k)}"
+        self.local.set(key, list(docs))
+        self.store.set(
+            key,
+            json.dumps(
+                [
+                    {"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}
+                    for doc in docs
+                ],
+                default=str,
+            ),
+            self.ttl,
+        )
+
+    async def aget(self, query: str, filter: Dict, top_k: int) -> Optional[List]:
+        return await run_blocking(self.get, query, filter, top_k)
+
+    async def aset(self, query: str, filter: Dict, top_k: int, docs: List):
+        await run_blocking(self.set, query, filter, top_k, docs)
+
+    def bump_generation(self) -> int:
+        generation = self.index_generation.bump()
+        self.local.clear()
+        return generation
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.index_generation.get(),
+            "local": self.local.stats(),
+            "shared": {
+                "backend": type(self.store).__name__,
+                "hits": self.shared_hits,
+                "misses": self.shared_misses,
+            },
+        }
+
+
+def invalidate_index_caches():
+    """
+    Invalidate every cache derived from the vector index after it changes.
+    Ingestion usually runs offline, without the caches of a server, so the
+    shared generation is bumped through the store itself; serving workers
+    see it on their next generation read.
+    """
+    try:
+        if State.retrieval_cache is not None:
+            generation = State.retrieval_cache.bump_generation()
+        else:
+            generation = IndexGeneration().bump()
+        State.logger.info(f"Index generation bumped to {generation}")
+    except Exception as e:
+        State.logger.error(f"Error bumping the index generation: {e}")
+    if State.answer_cache is not None:
+        State.answer_cache.clear()
@@ -0,0 +1,230 @@
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+
+from api.utils.tokens import count_tokens, truncate_tokens
+
+WORD_PATTERN = re.compile(r"\w+")
+SPAN_SEPARATOR = "\n\n[...]\n\n"
+# documents are joined with "\n\n" in the prompt
+DOC_SEPARATOR_TOKENS = 1
+
+
+class ContextService:
+    """
+    Post-processes retrieved chunks before they go into the prompt. The
+    readers split pages with a 200 character overlap, so neighbouring chunks
+    of a page repeat text. Overlapping chunks of the same source are stitched
+    into one span, near-identical passages are dropped, and the spans of a
+    page are combined into one document so it is listed once.
+    """
+
+    enabled = os.getenv("CONTEXT_MERGE_ENABLED", "true").lower() == "true"
+    dedup_threshold = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+    shingle_size = int(os.getenv("CONTEXT_SHINGLE_SIZE", "5"))
+    # chunks ingested without `start_index` are stitched by matching text
+    min_overlap = int(os.getenv("CONTEXT_MIN_OVERLAP", "50"))
+    context_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+    answer_reserve = int(os.getenv("ANSWER_TOKEN_RESERVE", "1024"))
+    min_truncated_tokens = int(os.getenv("CONTEXT_MIN_TRUNCATED_TOKENS", "64"))
+    _template_tokens: Dict[int, int] = {}
+
+    @staticmethod
+    def _text_overlap(left: str, right: str) -> int:
+        """Length of the longest suffix of `left` that is a prefix of `right`."""
+        probe = right[: ContextService.min_overlap]
+        if len(probe) < ContextService.min_overlap:
+            return 0
+        start = left.find(probe, max(0, len(left) - len(right)))
+        while start != -1:
+            if right.startswith(left[start:]):
+                return len(left) - start
+            start = left.find(probe, start + 1)
+        return 0
+
+    @staticmethod
+    def _stitch(left: Dict, right: Dict) -> Optional[Dict]:
+        """Join two spans of one source if they overlap, else None."""
+        if left["start"] is not None and right["start"] is not None:
+            if right["start"] < left["start"]:
+                left, right = right, left
+            tail = left["text"][right["start"] - left["start"] :]
+            # the offsets are per original document, so the text must agree
+            # too (e.g. two conversations of one dataset share a source)
+            if not tail:
+                return None
+            if tail.startswith(right["text"]):
+                text = left["text"]
+            elif right["text"].startswith(tail):
+                text = left["text"] + right["text"][len(tail) :]
+            else:
+                return None
+        else:
+            shared = ContextService._text_overlap(left["text"], right["text"])
+            if not shared:
+                left, right = right, left
+                shared = ContextService._text_overlap(left["text"], right["text"])
+            if not shared:
+                return None
+            text = left["text"] + right["text"][shared:]
+        return {
+            "text": text,
+            "start": left["start"],
+            "rank": min(left["rank"], right["rank"]),
+            "doc": left["doc"] if left["rank"] < right["rank"] else right["doc"],
+            "chunks": left["chunks"] + right["chunks"],
+        }
+
+    @staticmethod
+    def _shingles(text: str) -> Set[tuple]:
+        words = WORD_PATTERN.findall(text.lower())
+        size = ContextService.shingle_size
+        if len(words) <= size:
+            return {tuple(words)}
+        return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+    @staticmethod
+    def _near_duplicate(shingles: Set[tuple], kept: List[Set[tuple]]) -> bool:
+        for other in kept:
+            union = len(shingles | other)
+            similarity = len(shingles & other) / union if union else 0.0
+            if similarity >= ContextService.dedup_threshold:
+                return True
+        return False
+
+    @staticmethod
+    def merge(docs: List[Document]) -> List[Document]:
+        """
+        Stitch, de-duplicate and group `docs`, which are in relevance order.
+        Each page keeps the rank of its best chunk.
+        """
+        if not ContextService.enabled or len(docs) < 2:
+            return list(docs)
+        spans_by_source: Dict[str, List[Dict]] = {}
+        for rank, doc in enumerate(docs):
+            span = {
+                "text": doc.page_content,
+                "start": doc.metadata.get("start_index"),
+                "rank": rank,
+                "doc": doc,
+                "chunks": 1,
+            }
+            spans = spans_by_source.setdefault(doc.metadata.get("source", rank), [])
+            # stitch transitively: a merged span may now reach another one
+            merged = True
+            while merged:
+                merged = False
+                for i, other in enumerate(spans):
+                    stitched = ContextService._stitch(other, span)
+                    if stitched is not None:
+                        span = stitched
+                        spans.pop(i)
+                        merged = True
+                        break
+            spans.append(span)
+
+        kept, kept_shingles = [], []
+        for span in sorted(
+            (span for spans in spans_by_source.values() for span in spans),
+            key=lambda span: span["rank"],
+        ):
+            shingles = ContextService._shingles(span["text"])
+            if ContextService._near_duplicate(shingles, kept_shingles):
+                continue
+            kept.append(span)
+            kept_shingles.append(shingles)
+
+        pages: Dict[str, List[Dict]] = {}
+        for span in kept:
+            source = span["doc"].metadata.get("source", span["rank"])
+            pages.setdefault(source, []).append(span)
+        merged_docs = []
+        for spans in pages.values():
+            if all(span["start"] is not None for span in spans):
+                spans = sorted(spans, key=lambda span: span["start"])
+            best = min(spans, key=lambda span: span["rank"])
+            metadata = dict(best["doc"].metadata)
+            metadata["merged_chunks"] = sum(span["chunks"] for span in spans)
+            if spans[0]["start"] is not None:
+                metadata["start_index"] = spans[0]["start"]
+            merged_docs.append(
+                (
+                    best["rank"],
+                    Document(
+                        id=best["doc"].id,
+                        page_content=SPAN_SEPARATOR.join(span["text"] for span in spans),
+                        metadata=metadata,
+                    ),
+                )
+            )
+        return [doc for _, doc in sorted(merged_docs, key=lambda item: item[0])]
+
+    @staticmethod
+    def _count_template(prompt: ChatPromptTemplate) -> int:
+        tokens = ContextService._template_tokens.get(id(prompt))
+        if tokens is None:
+            tokens = count_tokens(
+                prompt.format(question="", context="", chat_history="")
+            )
+            ContextService._template_tokens[id(prompt)] = tokens
+        return tokens
+
+    @staticmethod
+    def pack(
+        docs: List[Document],
+        prompt: ChatPromptTemplate,
+        question: str,
+        chat_history: str,
+        prompt_budget: int,
+    ) -> Tuple[List[Document], Dict[str, int]]:
+        """
+        Fit `docs`, in relevance order, into what is left of `prompt_budget`
+        after the template, question, chat history and the answer reserve,
+        capped at CONTEXT_TOKEN_BUDGET. The document at the boundary is
+        truncated if at least CONTEXT_MIN_TRUNCATED_TOKENS of it fit, and
+        the rest are dropped. Returns the packed documents and token usage.
+        """
+        history_tokens = count_tokens(chat_history)
+        fixed = (
+            ContextService._count_template(prompt)
+            + count_tokens(question)
+            + history_tokens
+        )
+        budget = max(
+            0,
+            min(
+                ContextService.context_budget,
+                prompt_budget - ContextService.answer_reserve - fixed,
+            ),
+        )
+        packed, used, truncated = [], 0, 0
+        for doc in docs:
+            tokens = count_tokens(doc.page_content) + DOC_SEPARATOR_TOKENS
+            if used + tokens <= budget:
+                packed.append(doc)
+                used += tokens
+                continue
+            remaining = budget - used - DOC_SEPARATOR_TOKENS
+            if remaining >= ContextService.min_truncated_tokens:
+                packed.append(
+                    Document(
+                        id=doc.id,
+                        page_content=truncate_tokens(doc.page_content, remaining),
+                        metadata={**doc.metadata, "truncated": True},
+                    )
+                )
+                used += remaining + DOC_SEPARATOR_TOKENS
+                truncated = 1
+            break
+        return packed, {
+            "prompt_tokens": fixed + used,
+            "context_tokens": used,
+            "history_tokens": history_tokens,
+            "context_budget": budget,
+            "docs_packed": len(packed),
+            "docs_dropped": len(docs) - len(packed),
+            "docs_truncated": truncated,
+        }
@@ -1,13 +1,277 @@
+import asyncio
+import hashlib
 import os
-from typing import Union
+import threading
+from typing import Dict, List, Union
 
+import numpy as np
 import torch
 from langchain_community.embeddings.sentence_transformer import (
     SentenceTransformerEmbeddings,
 )
 from langchain_cohere.embeddings import CohereEmbeddings
+from langchain_core.embeddings import Embeddings
 from ..enums.enums import EmbeddingsService
 from api.config.state import State
+from api.services.cache_service import LRUCache
+from api.utils.concurrency import run_blocking
+
+
+class BoundedExecutorEmbeddings(Embeddings):
+    """
+    Wraps a local (blocking) embeddings model so that its async methods run
+    on the shared bounded executor instead of the event loop.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await run_blocking(self.embeddings.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await run_blocking(self.embeddings.embed_query, text)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in one forward pass (query and document encoding match)."""
+        return await run_blocking(self.embeddings.embed_documents, texts)
+
+
+class MicroBatchingEmbeddings(BoundedExecutorEmbeddings):
+    """
+    Coalesces concurrent `aembed_query` calls into batched forward passes.
+
+    The first queued request opens a batch that collects further requests
+    for up to `max_wait_ms` or until `max_batch_size` texts are waiting; the
+    batch is then encoded with a single `embed_documents` call on the bounded
+    executor and every caller receives its own vector. While a batch is being
+    encoded new requests keep queuing, so batches grow with load.
+    SentenceTransformer's `embed_query(text)` is `embed_documents([text])[0]`,
+    so batching does not change the vectors.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        super().__init__(embeddings)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.batched_items = 0
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # callers that were cancelled while queued do not need a vector
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                vectors = await run_blocking(
+                    self.embeddings.embed_documents, [text for text, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_items += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.batched_items,
+            "avg_batch_size": (
+                self.batched_items / self.batches if self.batches else 0.0
+            ),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with a bounded LRU over `embed_query`, keyed on the
+    whitespace-normalized text, and a content-hash cache in front of
+    `embed_documents`. Vectors are kept as float32 arrays to bound memory.
+
+    Document vectors can also be pinned, which serves them regardless of
+    the LRU until they are unpinned. Ingestion pins the vectors of batches
+    in flight to stores that embed on insert.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        query_cache_size: int = 4096,
+        document_cache_size: int = 2048,
+    ):
+        self.embeddings = embeddings
+        self.query_cache = LRUCache(max_size=query_cache_size)
+        self.document_cache = LRUCache(max_size=document_cache_size)
+        # content hash -> [vector, pin count]
+        self._pinned: Dict[str, list] = {}
+        self._pin_lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def embed_query(self, text: str) -> List[float]:
+        text = self._normalize(text)
+        vector = self.query_cache.get(text)
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            self.query_cache.set(text, vector)
+        return vector.tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        text = self._normalize(text)
+        vector = self.query_cache.get(text)
+        if vector is None:
+            vector = np.asarray(
+                await self.embeddings.aembed_query(text), dtype=np.float32
+            )
+            self.query_cache.set(text, vector)
+        return vector.tolist()
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of queries, serving repeats from the query LRU and
+        encoding the rest in one batched call when the model supports it.
+        """
+        texts = [self._normalize(text) for text in texts]
+        vectors = [self.query_cache.get(text) for text in texts]
+        missing = list(
+            dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None)
+        )
+        if missing:
+            if hasattr(self.embeddings, "aembed_queries"):
+                computed = await self.embeddings.aembed_queries(missing)
+            else:
+                computed = await asyncio.gather(
+                    *(self.embeddings.aembed_query(text) for text in missing)
+                )
+            fresh = {
+                text: np.asarray(vector, dtype=np.float32)
+                for text, vector in zip(missing, computed)
+            }
+            for text, vector in fresh.items():
+                self.query_cache.set(text, vector)
+            vectors = [
+                vector if vector is not None else fresh[text]
+                for text, vector in zip(texts, vectors)
+            ]
+        return [vector.tolist() for vector in vectors]
+
+    def pin_documents(self, texts: List[str], vectors: List[List[float]]):
+        """Serve the vectors of `texts` until `unpin_documents` is called."""
+        with self._pin_lock:
+            for text, vector in zip(texts, vectors):
+                key = self._content_hash(text)
+                if key in self._pinned:
+                    self._pinned[key][1] += 1
+                else:
+                    self._pinned[key] = [np.asarray(vector, dtype=np.float32), 1]
+
+    def unpin_documents(self, texts: List[str]):
+        with self._pin_lock:
+            for text in texts:
+                key = self._content_hash(text)
+                pinned = self._pinned.get(key)
+                if pinned is not None:
+                    pinned[1] -= 1
+                    if not pinned[1]:
+                        del self._pinned[key]
+
+    def _cached_document(self, key: str):
+        with self._pin_lock:
+            pinned = self._pinned.get(key)
+        return pinned[0] if pinned is not None else self.document_cache.get(key)
+
+    def _split_cached(self, texts: List[str]):
+        keys = [self._content_hash(text) for text in texts]
+        vectors = [self._cached_document(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        return keys, vectors, missing
+
+    def _merge(self, keys, vectors, missing, computed) -> List[List[float]]:
+        for i, vector in zip(missing, computed):
+            vectors[i] = np.asarray(vector, dtype=np.float32)
+            self.document_cache.set(keys[i], vectors[i])
+        return [vector.tolist() for vector in vectors]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._split_cached(texts)
+        computed = (
+            self.embeddings.embed_documents([texts[i] for i in missing])
+            if missing
+            else []
+        )
+        return self._merge(keys, vectors, missing, computed)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._split_cached(texts)
+        computed = (
+            await self.embeddings.aembed_documents([texts[i] for i in missing])
+            if missing
+            else []
+        )
+        return self._merge(keys, vectors, missing, computed)
+
+    def stats(self):
+        stats = {
+            "query": self.query_cache.stats(),
+            "documents": self.document_cache.stats(),
+            "pinned_documents": len(self._pinned),
+        }
+        if hasattr(self.embeddings, "stats"):
+            stats["micro_batching"] = self.embeddings.stats()
+        return stats
 
 
 class EmbeddingsFactory:
@@ -15,7 +279,42 @@ class EmbeddingsFactory:
     def get_embeddings(
         embeddings_service: str,
         model_id: str = None,
-    ) -> Union[CohereEmbeddings, SentenceTransformerEmbeddings]:
+        cache_size: int = None,
+        micro_batching: bool = False,
+    ) -> Union[CohereEmbeddings, BoundedExecutorEmbeddings, CachedEmbeddings]:
+        """
+        Build the embeddings model for `embeddings_service`. When `cache_size`
+        (default: EMBEDDINGS_CACHE_SIZE) is positive the model is wrapped in a
+        `CachedEmbeddings` with an LRU of that many query vectors.
+        `micro_batching` batches concurrent query embeddings of local
+        sentence-transformers models.
+        """
+        if cache_size is None:
+            cache_size = int(os.getenv("EMBEDDINGS_CACHE_SIZE", "4096"))
+        embeddings = EmbeddingsFactory.__get_base_embeddings(
+            embeddings_service, model_id
+        )
+        if micro_batching and isinstance(embeddings, BoundedExecutorEmbeddings):
+            embeddings = MicroBatchingEmbeddings(
+                embeddings.embeddings,
+                max_batch_size=int(os.getenv("EMBEDDINGS_MAX_BATCH_SIZE", "32")),
+                max_wait_ms=float(os.getenv("EMBEDDINGS_MAX_WAIT_MS", "5")),
+            )
+        if cache_size > 0:
+            return CachedEmbeddings(
+                embeddings,
+                query_cache_size=cache_size,
+                document_cache_size=int(
+                    os.getenv("EMBEDDINGS_DOCUMENT_CACHE_SIZE", "2048")
+                ),
+            )
+        return embeddings
+
+    @staticmethod
+    def __get_base_embeddings(
+        embeddings_service: str,
+        model_id: str = None,
+    ) -> Union[CohereEmbeddings, BoundedExecutorEmbeddings]:
         if embeddings_service == EmbeddingsService.COHERE.value:
             State.logger.info("Using Cohere embeddings model.")
             return CohereEmbeddings(
@@ -25,13 +324,15 @@ class EmbeddingsFactory:
         elif embeddings_service == EmbeddingsService.SENTENCE_TRANSFORMERS.value:
             State.logger.info("Using Sentence Transformers embeddings model.")
             if model_id is not None:
-                return SentenceTransformerEmbeddings(
-                    model_name=model_id,
-                    model_kwargs={
-                        "device": torch.device(
-                            "cuda" if torch.cuda.is_available() else "cpu"
-                        )
-                    },
+                return BoundedExecutorEmbeddings(
+                    SentenceTransformerEmbeddings(
+                        model_name=model_id,
+                        model_kwargs={
+                            "device": torch.device(
+                                "cuda" if torch.cuda.is_available() else "cpu"
+                            )
+                        },
+                    )
                 )
             else:
                 raise ValueError("Model is required for SentenceTransformerEmbeddings")
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+import api.config.constant as constant
+from api.config.state import State
+from api.database.database import AsyncSessionLocal
+from api.models.session_summary import SessionSummary
+from api.services.llm_factory import LLMFactory
+from api.utils.tokens import count_tokens
+
+Turn = Tuple[str, str]
+
+
+class HistoryService:
+    """
+    Builds the chat history that goes into the prompt. The newest turns are
+    kept verbatim, up to `HISTORY_MAX_TURNS` turns and `HISTORY_TOKEN_BUDGET`
+    tokens. Older turns are folded into a per-session rolling summary. The
+    summary is only updated when turns fall off the verbatim window, and the
+    update runs after the answer so it stays off the request path.
+    """
+
+    max_turns = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+    token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+    summary_enabled = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+    summary_max_words = int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", "250"))
+    summary_model = os.getenv("HISTORY_SUMMARY_MODEL")
+    # at most one summary update per session is in flight
+    _tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def to_turns(messages: Sequence[BaseMessage]) -> List[Turn]:
+        turns = []
+        for message in messages or []:
+            if isinstance(message, HumanMessage):
+                turns.append([message.content, ""])
+            elif isinstance(message, AIMessage):
+                if turns and not turns[-1][1]:
+                    turns[-1][1] = message.content
+                else:
+                    turns.append(["", message.content])
+        return [tuple(turn) for turn in turns]
+
+    @staticmethod
+    def format_turns(turns: Sequence[Turn]) -> str:
+        return "".join(
+            f"Human: {question}\nAssistant: {answer}\n\n" for question, answer in turns
+        )
+
+    @staticmethod
+    def split(turns: Sequence[Turn]) -> Tuple[List[Turn], List[Turn]]:
+        """
+        Split turns into (older, recent). `recent` is the longest suffix
+        within the turn and token limits, and always holds the newest turn.
+        """
+        used = 0
+        start = len(turns)
+        while start > 0 and len(turns) - start < HistoryService.max_turns:
+            tokens = count_tokens(HistoryService.format_turns([turns[start - 1]]))
+            if start < len(turns) and used + tokens > HistoryService.token_budget:
+                break
+            used += tokens
+            start -= 1
+        return list(turns[:start]), list(turns[start:])
+
+    @staticmethod
+    def _turn_hash(turn: Turn) -> str:
+        return hashlib.sha256("\x00".join(turn).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    async def abuild(session_id: str, messages: Sequence[BaseMessage]) -> str:
+        older, recent = HistoryService.split(HistoryService.to_turns(messages))
+        history = HistoryService.format_turns(recent)
+        if older and HistoryService.summary_enabled:
+            summary = await HistoryService._aload_summary(session_id)
+            if summary is not None and summary.summary:
+                history = (
+                    f"Summary of the earlier conversation: {summary.summary}\n\n"
+                    f"{history}"
+                )
+        return history
+
+    @staticmethod
+    def schedule_update(session_id: str, memory_instance, model_name: str):
+        """Fold turns that fell off the verbatim window into the summary, in the background."""
+        if not HistoryService.summary_enabled or not session_id or not model_name:
+            return
+        running = HistoryService._tasks.get(session_id)
+        if running is not None and not running.done():
+            # the next turn picks up whatever this update misses
+            return
+        task = asyncio.create_task(
+            HistoryService._aupdate(session_id, memory_instance, model_name)
+        )
+        HistoryService._tasks[session_id] = task
+        task.add_done_callback(
+            lambda done: HistoryService._tasks.pop(session_id, None)
+            if HistoryService._tasks.get(session_id) is done
+            else None
+        )
+
+    @staticmethod
+    async def drain():
+        """Wait for in-flight summary updates, used on shutdown."""
+        tasks = list(HistoryService._tasks.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _aload_summary(session_id: str) -> Optional[SessionSummary]:
+        async with AsyncSessionLocal() as db:
+            return await db.get(SessionSummary, session_id)
+
+    @staticmethod
+    async def _aupdate(session_id: str, memory_instance, model_name: str):
+        try:
+            older, _ = HistoryService.split(
+                HistoryService.to_turns(await memory_instance.aget_messages())
+            )
+            if not older:
+                return
+            async with AsyncSessionLocal() as db:
+                summary = await db.get(SessionSummary, session_id)
+                # only the turns after the last summarized one are new; if that
+                # turn already slid out of the loaded window, all older are new
+                new_turns = older
+                if summary is not None and summary.last_turn_hash:
+                    hashes = [HistoryService._turn_hash(turn) for turn in older]
+                    if summary.last_turn_hash in hashes:
+                        last = len(hashes) - 1 - hashes[::-1].index(
+                            summary.last_turn_hash
+                        )
+                        new_turns = older[last + 1 :]
+                if not new_turns:
+                    return
+
+                model = LLMFactory.get_chat_model(
+                    model_name=HistoryService.summary_model or model_name,
+                    temperature=0.0,
+                )
+                response = await model.ainvoke(
+                    constant.SUMMARY_PROMPT.format(
+                        summary=summary.summary if summary else "None",
+                        turns=HistoryService.format_turns(new_turns),
+                        max_words=HistoryService.summary_max_words,
+                    )
+                )
+                if summary is None:
+                    summary = SessionSummary(session_id=session_id, turns_summarized=0)
+                    db.add(summary)
+                summary.summary = response.content
+                summary.last_turn_hash = HistoryService._turn_hash(new_turns[-1])
+                summary.turns_summarized = (summary.turns_summarized or 0) + len(
+                    new_turns
+                )
+                await db.commit()
+                State.logger.info(
+                    f"Summarized {len(new_turns)} turn(s) of session {session_id}."
+                )
+        except Exception as e:
+            State.logger.error(f"Error updating history summary: {e}")
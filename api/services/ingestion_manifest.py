@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Set
+
+from langchain_core.documents import Document
+
+from api.config.state import State
+
+
+FILTER_FIELDS = ("source", "category", "sub_category")
+
+
+@dataclass
+class ManifestDiff:
+    # manifest entries of the new or changed chunks, by chunk ID
+    added: Dict[str, Dict] = field(default_factory=dict)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+class IngestionManifest:
+    """
+    Chunk IDs ingested from one source (a docs directory or a dataset), with
+    the page and category each came from. Chunk IDs hash the source, offset
+    and content, so comparing a fresh load with the manifest tells which
+    chunks are new or changed (to embed and upsert) and which vanished (to
+    delete).
+    """
+
+    def __init__(self, name: str, path: str = None):
+        self.name = name
+        path = path or IngestionManifest.directory()
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")[:64]
+        digest = hashlib.sha256(name.encode("utf-8")).hexdigest()[:12]
+        self.file = os.path.join(path, f"{slug}-{digest}.json")
+        self.entries: Dict[str, Dict] = {}
+        if os.path.exists(self.file):
+            with open(self.file, encoding="utf-8") as f:
+                self.entries = json.load(f)["chunks"]
+            State.logger.info(
+                f"Loaded ingestion manifest for {name} with {len(self.entries)} chunks."
+            )
+
+    def diff(
+        self,
+        docs: Iterable[Document],
+        diff: ManifestDiff,
+        keep_sources: Set[str] = None,
+    ) -> Iterator[Document]:
+        """
+        Yield the new or changed chunks of `docs` while recording the diff
+        into `diff`, so a streamed load is never held in memory. The removed
+        chunks are known once the generator is exhausted. Chunks of pages in
+        `keep_sources` (which may be filled while `docs` streams) count as
+        unchanged even if `docs` did not include them.
+        """
+        seen = set()
+        for doc in docs:
+            if doc.id in seen:
+                continue
+            seen.add(doc.id)
+            if doc.id in self.entries:
+                diff.unchanged.append(doc.id)
+            else:
+                diff.added[doc.id] = IngestionManifest.entry(doc)
+                yield doc
+        keep_sources = keep_sources or set()
+        for chunk_id, entry in self.entries.items():
+            if chunk_id in seen:
+                continue
+            if entry.get("source") in keep_sources:
+                diff.unchanged.append(chunk_id)
+            else:
+                diff.removed.append(chunk_id)
+
+    def sources(self) -> Set[str]:
+        return {entry.get("source") for entry in self.entries.values()}
+
+    @staticmethod
+    def directory() -> str:
+        return os.getenv("INGEST_MANIFEST_PATH", ".cache/ingest_manifests")
+
+    @staticmethod
+    def entry(doc: Document) -> Dict:
+        return {
+            field: doc.metadata[field] for field in FILTER_FIELDS if field in doc.metadata
+        }
+
+    @staticmethod
+    def prune(filter: Dict[str, Any]) -> int:
+        """
+        Drop the chunks matching `filter` from every manifest, after they were
+        deleted from the stores, so the next ingestion uploads them again.
+        """
+        if not any(value is not None for value in (filter or {}).values()):
+            return 0
+        path = IngestionManifest.directory()
+        if not os.path.isdir(path):
+            return 0
+        pruned = 0
+        for file in os.listdir(path):
+            if not file.endswith(".json"):
+                continue
+            with open(os.path.join(path, file), encoding="utf-8") as f:
+                manifest = IngestionManifest(json.load(f)["name"], path)
+            entries = {
+                chunk: entry
+                for chunk, entry in manifest.entries.items()
+                if not all(
+                    value is None or entry.get(field) == value
+                    for field, value in filter.items()
+                )
+            }
+            if len(entries) != len(manifest.entries):
+                pruned += len(manifest.entries) - len(entries)
+                manifest.save(entries)
+        return pruned
+
+    def save(self, entries: Dict[str, Dict]):
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        with open(self.file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"name": self.name, "chunks": entries}, f)
+        os.replace(self.file + ".tmp", self.file)
+        self.entries = entries
@@ -0,0 +1,190 @@
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+from tqdm import tqdm
+
+from api.config.state import State
+
+_FAILED = object()
+
+
+class AdaptiveBatchSize:
+    """
+    Batch size steered by upload latency: doubled while batches finish well
+    under `target_seconds`, halved when they take longer or fail.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_seconds: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self._size = max(minimum, min(initial, maximum))
+        self._lock = threading.Lock()
+
+    def get(self) -> int:
+        return self._size
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            if not ok or seconds > self.target_seconds:
+                self._size = max(self.minimum, self._size // 2)
+            elif seconds < self.target_seconds / 2:
+                self._size = min(self.maximum, self._size * 2)
+
+
+class IngestionPipeline:
+    """
+    Staged ingestion: documents are grouped into batches, embedded by
+    `embed_workers` threads and upserted by `upload_workers` threads. The
+    stages are joined by bounded queues, so embedding the next batches
+    overlaps uploading the previous ones and a slow store back-pressures the
+    loader instead of buffering the corpus. Failed batches are retried with
+    exponential backoff. After the last attempt a batch is counted as failed
+    and the run continues.
+
+    `embed(documents)` returns the vectors, or None to let the store embed.
+    `upload(documents, vectors)` writes one batch.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[Document]], Optional[List[List[float]]]],
+        upload: Callable[[List[Document], Optional[List[List[float]]]], None],
+        embed_workers: int = None,
+        upload_workers: int = None,
+        queue_size: int = None,
+        desc: str = "Ingesting",
+    ):
+        self.embed = embed
+        self.upload = upload
+        self.embed_workers = embed_workers or int(os.getenv("INGEST_EMBED_WORKERS", "1"))
+        self.upload_workers = upload_workers or int(
+            os.getenv("INGEST_UPLOAD_WORKERS", "4")
+        )
+        self.queue_size = queue_size or int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+        self.retries = int(os.getenv("INGEST_RETRIES", "3"))
+        self.backoff = float(os.getenv("INGEST_BACKOFF_S", "0.5"))
+        self.batch_size = AdaptiveBatchSize(
+            initial=int(os.getenv("INGEST_BATCH_SIZE", "64")),
+            minimum=int(os.getenv("INGEST_MIN_BATCH_SIZE", "8")),
+            maximum=int(os.getenv("INGEST_MAX_BATCH_SIZE", "512")),
+            target_seconds=float(os.getenv("INGEST_TARGET_BATCH_S", "5")),
+        )
+        self.desc = desc
+        self._lock = threading.Lock()
+        self._stats = {}
+        # IDs of the documents in batches that failed, so callers can retry them
+        self.failed_ids = set()
+
+    def _count(self, key: str, n: int):
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + n
+
+    def _fail(self, batch: List[Document]):
+        with self._lock:
+            self._stats["failed"] += len(batch)
+            self.failed_ids.update(doc.id for doc in batch)
+
+    def _with_retries(self, stage: str, func, *args):
+        for attempt in range(self.retries + 1):
+            try:
+                return func(*args)
+            except Exception as e:
+                if attempt == self.retries:
+                    State.logger.error(
+                        f"Ingestion {stage} batch failed after {attempt + 1} attempt(s): {e}"
+                    )
+                    return _FAILED
+                State.logger.warning(
+                    f"Ingestion {stage} batch failed, retrying (attempt {attempt + 1}): {e}"
+                )
+                time.sleep(self.backoff * 2**attempt)
+
+    def _embed_worker(self, inbox: queue.Queue, outbox: queue.Queue, bar: tqdm):
+        while True:
+            batch = inbox.get()
+            if batch is None:
+                return
+            vectors = self._with_retries("embed", self.embed, batch)
+            if vectors is _FAILED:
+                self._fail(batch)
+                continue
+            bar.update(len(batch))
+            outbox.put((batch, vectors))
+
+    def _upload_worker(self, inbox: queue.Queue, bar: tqdm):
+        while True:
+            item = inbox.get()
+            if item is None:
+                return
+            batch, vectors = item
+            start = time.perf_counter()
+            result = self._with_retries("upload", self.upload, batch, vectors)
+            ok = result is not _FAILED
+            self.batch_size.record(time.perf_counter() - start, ok)
+            if ok:
+                self._count("uploaded", len(batch))
+                bar.update(len(batch))
+            else:
+                self._fail(batch)
+
+    def run(self, documents: Iterable[Document]) -> Dict[str, int]:
+        """Ingest `documents`, which may be a generator, and return counts."""
+        self._stats = {"documents": 0, "uploaded": 0, "failed": 0}
+        self.failed_ids = set()
+        embed_queue = queue.Queue(maxsize=self.queue_size)
+        upload_queue = queue.Queue(maxsize=self.queue_size)
+        bars = {
+            stage: tqdm(desc=f"{self.desc} [{stage}]", unit="doc", position=position)
+            for position, stage in enumerate(("load", "embed", "upload"))
+        }
+        embedders = [
+            threading.Thread(
+                target=self._embed_worker,
+                args=(embed_queue, upload_queue, bars["embed"]),
+                daemon=True,
+            )
+            for _ in range(self.embed_workers)
+        ]
+        uploaders = [
+            threading.Thread(
+                target=self._upload_worker,
+                args=(upload_queue, bars["upload"]),
+                daemon=True,
+            )
+            for _ in range(self.upload_workers)
+        ]
+        for worker in embedders + uploaders:
+            worker.start()
+        start = time.perf_counter()
+        try:
+            batch = []
+            for doc in documents:
+                batch.append(doc)
+                bars["load"].update(1)
+                if len(batch) >= self.batch_size.get():
+                    embed_queue.put(batch)
+                    self._count("documents", len(batch))
+                    batch = []
+            if batch:
+                embed_queue.put(batch)
+                self._count("documents", len(batch))
+        finally:
+            # workers drain what is queued, then stop on the sentinels
+            for _ in embedders:
+                embed_queue.put(None)
+            for worker in embedders:
+                worker.join()
+            for _ in uploaders:
+                upload_queue.put(None)
+            for worker in uploaders:
+                worker.join()
+            for bar in bars.values():
+                bar.close()
+        stats = {**self._stats, "seconds": round(time.perf_counter() - start, 2)}
+        State.logger.info(f"{self.desc} finished: {stats}")
+        return stats
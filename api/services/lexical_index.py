@@ -0,0 +1,334 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from api.config.state import State
+
+TOKEN_PATTERN = re.compile(r"@?[A-Za-z_][A-Za-z0-9_]*|\d+(?:\.\d+)*")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+[A-Za-z]*")
+
+POSTINGS_FILE = "postings.npz"
+TERMS_FILE = "terms.json"
+DOCUMENTS_FILE = "documents.jsonl"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased tokens that keep code identifiers whole (`move_and_slide`,
+    `CharacterBody2D`, `@export`) and also emit their snake_case and
+    CamelCase parts, so both exact and partial identifier queries match.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text):
+        token = match.lower()
+        tokens.append(token)
+        word = match.lstrip("@")
+        parts = [
+            part.lower()
+            for piece in word.split("_")
+            for part in CAMEL_PATTERN.findall(piece)
+        ]
+        if len(parts) > 1 or (parts and parts[0] != token):
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the ingested chunks.
+
+    Documents are added incrementally and searched right away; `persist()`
+    compacts deletes and writes CSR postings (term -> doc, term frequency)
+    plus the chunk texts to `path`, from where the index is loaded at
+    startup. Scoring is vectorized per query term with NumPy. Equality
+    filters on `category`/`sub_category`/`source` use per-value row sets.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        k1: float = 1.2,
+        b: float = 0.75,
+        filter_fields: Iterable[str] = ("category", "sub_category", "source"),
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.filter_fields = tuple(filter_fields)
+        self._lock = threading.RLock()
+        # another process (offline ingestion) may persist a newer index
+        self._reload_interval = float(os.getenv("INDEX_RELOAD_CHECK_S", "1.0"))
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self._docs: List[Tuple[str, str, Dict]] = []
+        self._rows: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._doc_len = np.zeros(0, dtype=np.float32)
+        # postings loaded from disk, in CSR form
+        self._terms: Dict[str, int] = {}
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._postings_docs = np.zeros(0, dtype=np.int32)
+        self._postings_tfs = np.zeros(0, dtype=np.float32)
+        # postings of documents added since the last persist
+        self._pending: Dict[str, List[Tuple[int, int]]] = {}
+        self._values: Dict[str, Dict[Any, List[int]]] = {
+            field: {} for field in self.filter_fields
+        }
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    def _stored_mtime(self) -> Optional[int]:
+        # the documents file is replaced last by `persist`
+        try:
+            return os.stat(os.path.join(self.path, DOCUMENTS_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+    def stale(self) -> bool:
+        """
+        Whether another process persisted a newer index to `path`. The file
+        is checked at most every INDEX_RELOAD_CHECK_S seconds.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self._reload_interval:
+            return False
+        self._checked_at = now
+        mtime = self._stored_mtime()
+        return mtime is not None and mtime != self._loaded_mtime
+
+    def reload(self):
+        with self._lock:
+            self._reset()
+            self._load()
+
+    def _load(self):
+        self._loaded_mtime = self._stored_mtime()
+        postings_path = os.path.join(self.path, POSTINGS_FILE)
+        if not os.path.exists(postings_path):
+            return
+        postings = np.load(postings_path)
+        with open(os.path.join(self.path, TERMS_FILE), encoding="utf-8") as f:
+            terms = json.load(f)
+        docs = []
+        with open(os.path.join(self.path, DOCUMENTS_FILE), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                docs.append((record["id"], record["text"], record["metadata"]))
+        self._terms = {term: i for i, term in enumerate(terms)}
+        self._indptr = postings["indptr"]
+        self._postings_docs = postings["docs"]
+        self._postings_tfs = postings["tfs"]
+        self._doc_len = postings["doc_len"]
+        self._alive = np.ones(len(docs), dtype=bool)
+        self._register(docs)
+        State.logger.info(f"Loaded lexical index with {len(docs)} documents.")
+
+    def _register(self, docs: List[Tuple[str, str, Dict]]):
+        start = len(self._docs)
+        for offset, (doc_id, _, metadata) in enumerate(docs):
+            row = start + offset
+            previous = self._rows.get(doc_id)
+            if previous is not None:
+                # re-adding an id replaces the old document
+                self._alive[previous] = False
+            self._rows[doc_id] = row
+            for field in self.filter_fields:
+                value = metadata.get(field)
+                if value is not None:
+                    self._values[field].setdefault(value, []).append(row)
+        self._docs.extend(docs)
+
+    def add_documents(
+        self, documents: List[Document], ids: Optional[List[str]] = None
+    ) -> List[str]:
+        if not documents:
+            return []
+        ids = ids or [doc.id or uuid.uuid4().hex for doc in documents]
+        with self._lock:
+            start = len(self._docs)
+            lengths = []
+            for offset, doc in enumerate(documents):
+                counts = Counter(tokenize(doc.page_content))
+                lengths.append(sum(counts.values()))
+                for term, tf in counts.items():
+                    self._pending.setdefault(term, []).append((start + offset, tf))
+            self._alive = np.concatenate(
+                [self._alive, np.ones(len(documents), dtype=bool)]
+            )
+            self._doc_len = np.concatenate(
+                [self._doc_len, np.asarray(lengths, dtype=np.float32)]
+            )
+            self._register(
+                [
+                    (doc_id, doc.page_content, dict(doc.metadata))
+                    for doc_id, doc in zip(ids, documents)
+                ]
+            )
+        return list(ids)
+
+    def delete(self, ids: List[str]) -> int:
+        with self._lock:
+            rows = [self._rows.pop(doc_id) for doc_id in ids if doc_id in self._rows]
+            self._alive[rows] = False
+        return len(rows)
+
+    def delete_by_metadata_filter(self, filter: Dict[str, Any]) -> int:
+        if not any(value is not None for value in (filter or {}).values()):
+            return 0
+        with self._lock:
+            rows = np.flatnonzero(self._filter_mask(filter))
+            for row in rows:
+                self._rows.pop(self._docs[row][0], None)
+            self._alive[rows] = False
+        return int(len(rows))
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        mask = self._alive.copy()
+        for field, value in (filter or {}).items():
+            if value is None:
+                continue
+            if field in self._values:
+                allowed = np.zeros(len(self._docs), dtype=bool)
+                allowed[self._values[field].get(value, [])] = True
+                mask &= allowed
+            else:
+                for row in np.flatnonzero(mask):
+                    if self._docs[row][2].get(field) != value:
+                        mask[row] = False
+        return mask
+
+    def _term_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        docs, tfs = [], []
+        term_id = self._terms.get(term)
+        if term_id is not None:
+            start, end = self._indptr[term_id], self._indptr[term_id + 1]
+            docs.append(self._postings_docs[start:end])
+            tfs.append(self._postings_tfs[start:end])
+        pending = self._pending.get(term)
+        if pending:
+            array = np.asarray(pending, dtype=np.int64)
+            docs.append(array[:, 0].astype(np.int32))
+            tfs.append(array[:, 1].astype(np.float32))
+        if not docs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        return np.concatenate(docs), np.concatenate(tfs)
+
+    def search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not len(self._docs):
+                return []
+            mask = self._filter_mask(filter)
+            alive = self._alive
+            n_docs = max(int(alive.sum()), 1)
+            avg_len = float(self._doc_len[alive].mean()) if alive.any() else 1.0
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len / max(avg_len, 1.0))
+            scores = np.zeros(len(self._docs), dtype=np.float32)
+            for term in terms:
+                docs, tfs = self._term_postings(term)
+                if not len(docs):
+                    continue
+                df = int(alive[docs].sum())
+                if not df:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                np.add.at(scores, docs, idf * tfs * (self.k1 + 1) / (tfs + norm[docs]))
+            scores[~mask] = 0
+            matched = np.flatnonzero(scores > 0)
+            if not len(matched):
+                return []
+            k = min(k, len(matched))
+            top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (
+                    Document(
+                        id=self._docs[row][0],
+                        page_content=self._docs[row][1],
+                        metadata=self._docs[row][2],
+                    ),
+                    float(scores[row]),
+                )
+                for row in top
+            ]
+
+    def persist(self):
+        """Compact deletes and write the postings and documents to `path`."""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            rows = np.flatnonzero(self._alive)
+            remap = np.full(len(self._docs), -1, dtype=np.int64)
+            remap[rows] = np.arange(len(rows))
+            terms = sorted(set(self._terms) | set(self._pending))
+            indptr = [0]
+            all_docs, all_tfs = [], []
+            for term in terms:
+                docs, tfs = self._term_postings(term)
+                keep = remap[docs] >= 0
+                all_docs.append(remap[docs[keep]].astype(np.int32))
+                all_tfs.append(tfs[keep])
+                indptr.append(indptr[-1] + int(keep.sum()))
+            # terms that only occurred in deleted documents are dropped
+            keep_terms = np.diff(indptr) > 0
+            terms = [term for term, keep in zip(terms, keep_terms) if keep]
+            indptr = np.concatenate([[0], np.cumsum(np.diff(indptr)[keep_terms])])
+
+            postings_path = os.path.join(self.path, POSTINGS_FILE)
+            np.savez(
+                postings_path + ".tmp.npz",
+                indptr=indptr.astype(np.int64),
+                docs=np.concatenate(all_docs) if all_docs else np.zeros(0, np.int32),
+                tfs=np.concatenate(all_tfs) if all_tfs else np.zeros(0, np.float32),
+                doc_len=self._doc_len[rows],
+            )
+            terms_path = os.path.join(self.path, TERMS_FILE)
+            with open(terms_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(terms, f)
+            documents_path = os.path.join(self.path, DOCUMENTS_FILE)
+            with open(documents_path + ".tmp", "w", encoding="utf-8") as f:
+                for row in rows:
+                    doc_id, text, metadata = self._docs[row]
+                    f.write(
+                        json.dumps({"id": doc_id, "text": text, "metadata": metadata})
+                        + "\n"
+                    )
+            os.replace(postings_path + ".tmp.npz", postings_path)
+            os.replace(terms_path + ".tmp", terms_path)
+            os.replace(documents_path + ".tmp", documents_path)
+            self._reset()
+            self._load()
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Document]], k: int, rrf_k: int = 60
+) -> List[Document]:
+    """
+    Fuse ranked lists by reciprocal rank: score(d) = sum 1 / (rrf_k + rank).
+    Documents are matched across lists by source and content, since each
+    store assigns its own ids.
+    """
+    scores: Dict[Tuple, float] = {}
+    docs: Dict[Tuple, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = (doc.metadata.get("source"), doc.page_content)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked[:k]]
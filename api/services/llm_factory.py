@@ -1,5 +1,8 @@
+import asyncio
 import os
-from typing import Union
+import threading
+from functools import lru_cache
+from typing import Dict, Union
 
 from langchain_cohere.chat_models import ChatCohere
 from langchain_google_genai.chat_models import ChatGoogleGenerativeAI
@@ -8,26 +11,112 @@ from langchain_groq.chat_models import ChatGroq
 
 from ..enums.enums import LLMService
 from api.config.state import State
+from api.services.cache_service import LRUCache
 
 
 class LLMFactory:
+    """
+    Builds chat models and keeps them in a registry keyed by
+    (provider, model, temperature), so requests reuse warmed clients and
+    their keep-alive HTTP connection pools instead of opening new ones.
+    """
+
+    _clients = LRUCache(max_size=int(os.getenv("LLM_CLIENT_POOL_SIZE", "32")))
+    _pool_stats: Dict[str, Dict[str, int]] = {}
+    _lock = threading.Lock()
+    _limiters: Dict[str, asyncio.Semaphore] = {}
+
     @staticmethod
-    def get_chat_model(
-        model_name: str,
-        temperature: float = 0.7,
-    ) -> Union[ChatCohere, ChatGoogleGenerativeAI, ChatMistralAI, ChatGroq]:
+    @lru_cache(maxsize=256)
+    def resolve_service(model_name: str) -> str:
         if "gemini" in model_name:
-            llm_service = LLMService.GEMINI.value
+            return LLMService.GEMINI.value
         elif "command" in model_name:
-            llm_service = LLMService.COHERE.value
+            return LLMService.COHERE.value
         elif any(
             model in model_name.lower()
             for model in ["mistral", "ministral", "codestral"]
         ):
-            llm_service = LLMService.MISTRAL.value
+            return LLMService.MISTRAL.value
         elif any(model in model_name.lower() for model in ["llama", "gemma2", "qwen"]):
-            llm_service = LLMService.GROQ.value
+            return LLMService.GROQ.value
+        raise ValueError("Unsupported chat service.")
+
+    @staticmethod
+    def get_chat_model(
+        model_name: str,
+        temperature: float = 0.7,
+    ) -> Union[ChatCohere, ChatGoogleGenerativeAI, ChatMistralAI, ChatGroq]:
+        llm_service = LLMFactory.resolve_service(model_name)
+        key = (llm_service, model_name, float(temperature))
+        stats = LLMFactory._pool_stats.setdefault(
+            llm_service, {"hits": 0, "created": 0}
+        )
+        client = LLMFactory._clients.get(key)
+        if client is not None:
+            stats["hits"] += 1
+            return client
+        with LLMFactory._lock:
+            # another request may have created it while we waited for the lock
+            client = LLMFactory._clients.get(key)
+            if client is None:
+                client = LLMFactory.__create_chat_model(
+                    llm_service, model_name, temperature
+                )
+                LLMFactory._clients.set(key, client)
+                stats["created"] += 1
+            else:
+                stats["hits"] += 1
+            return client
 
+    @staticmethod
+    def concurrency_limiter(model_name: str) -> asyncio.Semaphore:
+        """
+        Semaphore shared by every caller of the model's provider, sized by
+        LLM_MAX_CONCURRENCY_<PROVIDER> or LLM_MAX_CONCURRENCY (default 4).
+        """
+        llm_service = LLMFactory.resolve_service(model_name)
+        limiter = LLMFactory._limiters.get(llm_service)
+        if limiter is None:
+            limit = os.getenv(
+                f"LLM_MAX_CONCURRENCY_{llm_service.upper()}",
+                os.getenv("LLM_MAX_CONCURRENCY", "4"),
+            )
+            limiter = LLMFactory._limiters.setdefault(
+                llm_service, asyncio.Semaphore(int(limit))
+            )
+        return limiter
+
+    @staticmethod
+    def prompt_token_budget(model_name: str) -> int:
+        """
+        Prompt size the model's requests are packed to, set by
+        PROMPT_TOKEN_BUDGET_<PROVIDER> or PROMPT_TOKEN_BUDGET (default 8000).
+        """
+        llm_service = LLMFactory.resolve_service(model_name)
+        return int(
+            os.getenv(
+                f"PROMPT_TOKEN_BUDGET_{llm_service.upper()}",
+                os.getenv("PROMPT_TOKEN_BUDGET", "8000"),
+            )
+        )
+
+    @staticmethod
+    def pool_stats() -> Dict[str, Dict[str, int]]:
+        clients: Dict[str, int] = {}
+        for llm_service, _, _ in LLMFactory._clients.keys():
+            clients[llm_service] = clients.get(llm_service, 0) + 1
+        return {
+            llm_service: {**stats, "clients": clients.get(llm_service, 0)}
+            for llm_service, stats in LLMFactory._pool_stats.items()
+        }
+
+    @staticmethod
+    def __create_chat_model(
+        llm_service: str,
+        model_name: str,
+        temperature: float,
+    ) -> Union[ChatCohere, ChatGoogleGenerativeAI, ChatMistralAI, ChatGroq]:
         if llm_service == LLMService.COHERE.value:
             State.logger.info("Using Cohere chat model.")
             return ChatCohere(
@@ -40,7 +129,6 @@ class LLMFactory:
             return ChatGoogleGenerativeAI(
                 model=model_name,
                 api_key=os.environ["GEMINI_API_KEY"],
-                disable_streaming=True,
                 temperature=temperature,
             )
         elif llm_service == LLMService.MISTRAL.value:
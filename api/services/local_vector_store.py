@@ -0,0 +1,656 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from api.config.state import State
+from api.utils.concurrency import run_blocking
+
+VECTORS_FILE = "vectors.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+IVF_FILE = "ivf.npz"
+META_FILE = "meta.json"
+QUANTIZATIONS = ("none", "int8", "binary")
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store over a memory-mapped matrix of unit-normalized
+    float32 or float16 vectors, scored with a vectorized NumPy dot product.
+
+    Rows added since the last `persist()` are kept in memory and searched
+    together with the mapped rows. Deletes tombstone rows until the next
+    `persist()` compacts them away. Equality filters on the fields in
+    `filter_fields` are answered from per-value bitmaps that are built once
+    and reused until the index changes. When `ivf_lists` is positive,
+    `persist()` also trains a spherical k-means partitioning and searches
+    only scan the `nprobe` lists closest to the query.
+
+    With `quantization` set to `int8` (per-dimension scaled) or `binary`
+    (sign bits), compact codes are kept in memory for a fast first pass.
+    Only the best `k * rescore_factor` candidates are then rescored exactly
+    against the float vectors, which stay on disk behind the memory map.
+    The mode is recorded per store directory, so each collection keeps its
+    own unless another one is requested explicitly.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        path: str,
+        dtype: str = "float32",
+        ivf_lists: int = 0,
+        nprobe: int = 8,
+        filter_fields: Iterable[str] = ("category", "sub_category", "source"),
+        quantization: Optional[str] = None,
+        rescore_factor: int = 40,
+    ):
+        if dtype not in ("float32", "float16"):
+            raise ValueError("dtype must be float32 or float16")
+        if quantization is None:
+            quantization = self._recorded_quantization(path)
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}")
+        self.embedding = embedding
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self.filter_fields = tuple(filter_fields)
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._lock = threading.RLock()
+        # another process (offline ingestion) may persist a newer store
+        self._reload_interval = float(os.getenv("INDEX_RELOAD_CHECK_S", "1.0"))
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._reset()
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _reset(self):
+        self._base = None
+        self._pending: List[np.ndarray] = []
+        self._extra = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._docs: List[Tuple[str, str, Dict]] = []
+        self._rows: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[Any, List[int]]] = {
+            field: {} for field in self.filter_fields
+        }
+        self._bitmaps: Dict[Tuple[str, Any], np.ndarray] = {}
+        self._centroids = None
+        self._lists: Optional[List[np.ndarray]] = None
+        self._codes = None
+        self._scale = None
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    # ------------------------------------------------------------------ load
+
+    def _stored_mtime(self) -> Optional[int]:
+        # the meta file is replaced last by `persist`; stores written before
+        # it existed only have the documents file
+        for name in (META_FILE, DOCUMENTS_FILE):
+            try:
+                return os.stat(os.path.join(self.path, name)).st_mtime_ns
+            except OSError:
+                continue
+        return None
+
+    def stale(self) -> bool:
+        """
+        Whether another process persisted a newer store to `path`. The file
+        is checked at most every INDEX_RELOAD_CHECK_S seconds.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self._reload_interval:
+            return False
+        self._checked_at = now
+        mtime = self._stored_mtime()
+        return mtime is not None and mtime != self._loaded_mtime
+
+    def reload(self):
+        with self._lock:
+            previous = dict(self.__dict__)
+            try:
+                self._reset()
+                self._load()
+            except Exception as e:
+                # caught mid-`persist` of another process: keep serving the
+                # loaded store and retry on the next check
+                self.__dict__.update(previous)
+                self._loaded_mtime = None
+                State.logger.warning(f"Could not reload local vector store: {e}")
+
+    def _load(self):
+        self._loaded_mtime = self._stored_mtime()
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if not os.path.exists(vectors_path):
+            return
+        base = np.load(vectors_path, mmap_mode="r")
+        docs = []
+        with open(os.path.join(self.path, DOCUMENTS_FILE), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                docs.append((record["id"], record["text"], record["metadata"]))
+        if len(docs) != base.shape[0]:
+            raise ValueError(
+                f"Local vector store at {self.path} is inconsistent: "
+                f"{base.shape[0]} vectors for {len(docs)} documents."
+            )
+        self._base = base
+        self.dtype = base.dtype
+        self._alive = np.ones(len(docs), dtype=bool)
+        self._index_documents(docs)
+        ivf_path = os.path.join(self.path, IVF_FILE)
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            # lists of an older write are ignored until they are retrained
+            if len(ivf["assignments"]) == len(docs):
+                self._set_ivf(ivf["centroids"], ivf["assignments"])
+        self._load_codes()
+        State.logger.info(f"Loaded local vector store with {len(docs)} vectors.")
+
+    def _index_documents(self, docs: List[Tuple[str, str, Dict]]):
+        start = len(self._docs)
+        for offset, (doc_id, text, metadata) in enumerate(docs):
+            row = start + offset
+            previous = self._rows.get(doc_id)
+            if previous is not None:
+                # re-adding an id replaces the old row
+                self._alive[previous] = False
+            self._rows[doc_id] = row
+            for field in self.filter_fields:
+                value = metadata.get(field)
+                values = value if isinstance(value, list) else [value]
+                for value in values:
+                    if value is not None:
+                        self._postings[field].setdefault(value, []).append(row)
+        self._docs.extend(docs)
+        self._bitmaps.clear()
+
+    # --------------------------------------------------------------- writes
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self._pending.append(vectors.astype(self.dtype))
+            self._extra = None
+            self._alive = np.concatenate([self._alive, np.ones(len(texts), dtype=bool)])
+            self._index_documents(
+                [
+                    (doc_id, text, dict(metadata or {}))
+                    for doc_id, text, metadata in zip(ids, texts, metadatas)
+                ]
+            )
+        return list(ids)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(
+            texts, self.embedding.embed_documents(texts), metadatas, ids
+        )
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            for doc_id in ids or []:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    self._alive[row] = False
+        return True
+
+    def delete_by_metadata_filter(self, filter: Dict[str, Any]) -> int:
+        if not any(value is not None for value in (filter or {}).values()):
+            # an empty filter matches nothing rather than the whole store
+            return 0
+        with self._lock:
+            rows = np.flatnonzero(self._filter_mask(filter))
+            for row in rows:
+                self._rows.pop(self._docs[row][0], None)
+            self._alive[rows] = False
+        return int(len(rows))
+
+    # --------------------------------------------------------- quantization
+
+    @staticmethod
+    def _recorded_quantization(path: str) -> str:
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f).get("quantization", "none")
+        return "none"
+
+    def _codes_path(self) -> str:
+        return os.path.join(self.path, f"codes_{self.quantization}.npz")
+
+    def _quantize(self, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        chunk = 65536
+        if matrix.shape[0] == 0:
+            # an emptied store still records its (empty) codes
+            if self.quantization == "binary":
+                return np.zeros((0, (matrix.shape[1] + 7) // 8), dtype=np.uint8), None
+            return np.zeros(matrix.shape, dtype=np.int8), None
+        if self.quantization == "binary":
+            codes = np.concatenate(
+                [
+                    np.packbits(matrix[i : i + chunk] > 0, axis=1)
+                    for i in range(0, matrix.shape[0], chunk)
+                ]
+            )
+            return codes, None
+        scale = np.zeros(matrix.shape[1], dtype=np.float32)
+        for i in range(0, matrix.shape[0], chunk):
+            scale = np.maximum(scale, np.abs(matrix[i : i + chunk]).max(axis=0))
+        scale[scale == 0] = 1.0
+        codes = np.concatenate(
+            [
+                np.rint(matrix[i : i + chunk] / scale * 127).astype(np.int8)
+                for i in range(0, matrix.shape[0], chunk)
+            ]
+        )
+        return codes, scale
+
+    def _load_codes(self):
+        if self.quantization == "none" or self._base is None:
+            return
+        codes_path = self._codes_path()
+        if os.path.exists(codes_path):
+            data = np.load(codes_path)
+            codes = data["codes"]
+            scale = data["scale"] if "scale" in data else None
+        else:
+            codes, scale = np.zeros((0, 0), dtype=np.uint8), None
+        if codes.shape[0] != self._base.shape[0]:
+            codes, scale = self._quantize(self._base)
+        self._codes, self._scale = codes, scale
+
+    def _approx_scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """First-pass scores from the codes; only their order matters."""
+        if self.quantization == "binary":
+            bits = np.packbits(query > 0)
+            # compare 64 bits at a time when the code width allows it
+            if codes.shape[1] % 8 == 0:
+                codes, bits = codes.view(np.uint64), bits.view(np.uint64)
+            return -np.bitwise_count(codes ^ bits).sum(axis=1, dtype=np.int32)
+        query = query * self._scale / 127
+        chunk = 2048
+        return np.concatenate(
+            [
+                codes[i : i + chunk].astype(np.float32) @ query
+                for i in range(0, codes.shape[0], chunk)
+            ]
+        )
+
+    def _shortlist(
+        self, rows: np.ndarray, codes: np.ndarray, n_base: int, query: np.ndarray, k: int
+    ) -> np.ndarray:
+        """Keep the best `k * rescore_factor` mapped rows by approximate score."""
+        base_rows = rows[rows < n_base]
+        extra_rows = rows[rows >= n_base]
+        keep = min(len(base_rows), k * self.rescore_factor)
+        if keep < len(base_rows):
+            # `rows` are sorted, so covering every base row means they are
+            # exactly 0..n_base-1 and the codes can be scored in place
+            approx = self._approx_scores(
+                codes if len(base_rows) == n_base else codes[base_rows], query
+            )
+            base_rows = np.sort(base_rows[np.argpartition(-approx, keep - 1)[:keep]])
+        return np.concatenate([base_rows, extra_rows])
+
+    def stats(self) -> Dict:
+        code_bytes = (
+            self._codes.shape[1] * self._codes.itemsize if self._codes is not None else 0
+        )
+        dim = self._base.shape[1] if self._base is not None else 0
+        return {
+            "vectors": len(self),
+            "dtype": str(self.dtype),
+            "quantization": self.quantization,
+            "ivf_lists": len(self._lists) if self._lists is not None else 0,
+            # bytes per vector that must stay in memory for a fast first pass
+            "resident_bytes_per_vector": code_bytes or dim * self.dtype.itemsize,
+        }
+
+    # --------------------------------------------------------------- search
+
+    def _extra_matrix(self) -> Optional[np.ndarray]:
+        if self._extra is None and self._pending:
+            self._extra = (
+                np.concatenate(self._pending)
+                if len(self._pending) > 1
+                else self._pending[0]
+            )
+            self._pending = [self._extra]
+        return self._extra
+
+    def _bitmap(self, field: str, value: Any) -> np.ndarray:
+        key = (field, value)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None or len(bitmap) != len(self._docs):
+            bitmap = np.zeros(len(self._docs), dtype=bool)
+            bitmap[self._postings[field].get(value, [])] = True
+            self._bitmaps[key] = bitmap
+        return bitmap
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        mask = self._alive.copy()
+        for field, value in (filter or {}).items():
+            if value is None:
+                continue
+            if field in self._postings:
+                mask &= self._bitmap(field, value)
+                continue
+            # fields without a bitmap are matched by scanning the metadata
+            for row in np.flatnonzero(mask):
+                metadata_value = self._docs[row][2].get(field)
+                if not (
+                    metadata_value == value
+                    or (isinstance(metadata_value, list) and value in metadata_value)
+                ):
+                    mask[row] = False
+        return mask
+
+    @staticmethod
+    def _rows_matrix(
+        rows: np.ndarray, base: Optional[np.ndarray], extra: Optional[np.ndarray]
+    ) -> np.ndarray:
+        n_base = 0 if base is None else base.shape[0]
+        base_rows = rows[rows < n_base]
+        extra_rows = rows[rows >= n_base] - n_base
+        parts = []
+        if len(base_rows):
+            parts.append(base[base_rows])
+        if len(extra_rows):
+            parts.append(extra[extra_rows])
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+    def _score(self, matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        # float16 matmul has no BLAS path, so upcast in bounded chunks; this
+        # upcast dominates flat float16 scans, which pair best with IVF
+        chunk = 4096
+        return np.concatenate(
+            [
+                matrix[i : i + chunk].astype(np.float32) @ query
+                for i in range(0, matrix.shape[0], chunk)
+            ]
+        )
+
+    def _candidates(self, query: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self._lists is None:
+            return np.flatnonzero(mask)
+        nprobe = min(self.nprobe, len(self._lists))
+        probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        n_base = self._base.shape[0]
+        rows = np.concatenate(
+            [self._lists[probe] for probe in probes]
+            + [np.arange(n_base, len(self._docs))]
+        )
+        # row order: `_shortlist` scores the full code matrix when every row
+        # is probed, and sorted gathers read the mapped file sequentially
+        rows = np.sort(rows)
+        return rows[mask[rows]]
+
+    def search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Tuple[Document, float]]:
+        query = self._normalize(np.asarray(embedding, dtype=np.float32))
+        # resolve the candidate rows under the lock and score a consistent
+        # snapshot outside of it, so concurrent searches run in parallel
+        with self._lock:
+            if not len(self._docs):
+                return []
+            mask = self._filter_mask(filter)
+            rows = self._candidates(query, mask)
+            base, extra, docs = self._base, self._extra_matrix(), self._docs
+            codes = self._codes
+            # gathering scattered rows out of the mapped file costs more than
+            # a sequential scan once a sizeable share of float32 rows match
+            full_scan = self._lists is None and (
+                len(rows) == len(docs)
+                or (self.dtype == np.float32 and len(rows) * 6 > len(docs))
+            )
+        if not len(rows):
+            return []
+        if codes is not None:
+            rows = self._shortlist(rows, codes, base.shape[0], query, k)
+            scores = self._score(self._rows_matrix(rows, base, extra), query)
+        elif full_scan:
+            parts = [m for m in (base, extra) if m is not None]
+            scores = np.concatenate([self._score(m, query) for m in parts])
+            if len(rows) != len(docs):
+                scores = scores[rows]
+        else:
+            scores = self._score(self._rows_matrix(rows, base, extra), query)
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (
+                Document(
+                    id=docs[rows[i]][0],
+                    page_content=docs[rows[i]][1],
+                    metadata=docs[rows[i]][2],
+                ),
+                float(scores[i]),
+            )
+            for i in top
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return self.search_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [doc for doc, _ in self.search_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return self.search_by_vector(
+            self.embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [
+            doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)
+        ]
+
+    async def asimilarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return await run_blocking(
+            self.similarity_search_by_vector, embedding, k=k, filter=filter
+        )
+
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        embedding = await self.embedding.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k=k, filter=filter)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    # -------------------------------------------------------------- persist
+
+    def _set_ivf(self, centroids: np.ndarray, assignments: np.ndarray):
+        self._centroids = centroids.astype(np.float32)
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        self._lists = [
+            order[bounds[i] : bounds[i + 1]] for i in range(len(centroids))
+        ]
+
+    def _assign(self, matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        chunk = 65536
+        return np.concatenate(
+            [
+                np.argmax(self._score(matrix[i : i + chunk], centroids.T), axis=1)
+                for i in range(0, matrix.shape[0], chunk)
+            ]
+        )
+
+    def _train_ivf(self, matrix: np.ndarray, iterations: int = 10):
+        """Spherical k-means on a sample, then assign every row to a list."""
+        rng = np.random.default_rng(0)
+        n_lists = self.ivf_lists
+        sample_size = min(matrix.shape[0], n_lists * 256)
+        sample = matrix[np.sort(rng.choice(matrix.shape[0], sample_size, replace=False))]
+        sample = sample.astype(np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[assignments == i]
+                if len(members):
+                    centroids[i] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+        return centroids, self._assign(matrix, centroids)
+
+    def persist(self):
+        """
+        Write live rows to `path`, compacting deletes, re-map the vectors
+        from disk and (re)train the IVF lists when enabled.
+        """
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            rows = np.flatnonzero(self._alive)
+            dim = (
+                self._base.shape[1]
+                if self._base is not None
+                else self._pending[0].shape[1]
+                if self._pending
+                else 0
+            )
+            vectors_path = os.path.join(self.path, VECTORS_FILE)
+            tmp_vectors = vectors_path + ".tmp.npy"
+            out = np.lib.format.open_memmap(
+                tmp_vectors, mode="w+", dtype=self.dtype, shape=(len(rows), dim)
+            )
+            chunk = 65536
+            for i in range(0, len(rows), chunk):
+                out[i : i + chunk] = self._rows_matrix(
+                    rows[i : i + chunk], self._base, self._extra_matrix()
+                )
+            out.flush()
+            del out
+
+            documents_path = os.path.join(self.path, DOCUMENTS_FILE)
+            with open(documents_path + ".tmp", "w", encoding="utf-8") as f:
+                for row in rows:
+                    doc_id, text, metadata = self._docs[row]
+                    f.write(
+                        json.dumps({"id": doc_id, "text": text, "metadata": metadata})
+                        + "\n"
+                    )
+            os.replace(tmp_vectors, vectors_path)
+            os.replace(documents_path + ".tmp", documents_path)
+
+            ivf_path = os.path.join(self.path, IVF_FILE)
+            matrix = np.load(vectors_path, mmap_mode="r")
+            # IVF needs enough rows per list to be worth probing
+            if self.ivf_lists > 0 and matrix.shape[0] >= self.ivf_lists * 39:
+                centroids, assignments = self._train_ivf(matrix)
+                np.savez(ivf_path + ".tmp.npz", centroids=centroids, assignments=assignments)
+                os.replace(ivf_path + ".tmp.npz", ivf_path)
+            elif os.path.exists(ivf_path):
+                os.remove(ivf_path)
+
+            if self.quantization != "none":
+                codes, scale = self._quantize(matrix)
+                arrays = {"codes": codes}
+                if scale is not None:
+                    arrays["scale"] = scale
+                np.savez(self._codes_path() + ".tmp.npz", **arrays)
+                os.replace(self._codes_path() + ".tmp.npz", self._codes_path())
+            meta_path = os.path.join(self.path, META_FILE)
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"quantization": self.quantization}, f)
+            os.replace(meta_path + ".tmp", meta_path)
+
+            self._reset()
+            self._load()
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: str = ".cache/local_vector_store",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding=embedding, path=path, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
@@ -1,19 +1,187 @@
+import copy
 import os
-from typing import Union
+import threading
+from typing import Dict, List, Sequence, Union
 from langchain.memory.chat_message_histories.upstash_redis import (
     UpstashRedisChatMessageHistory,
 )
 from langchain_astradb.chat_message_histories import AstraDBChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from sqlalchemy import select
 from ..enums.enums import MemoryService
 from api.config.state import State
+from api.database.database import AsyncSessionLocal, SessionLocal
+from api.models.session_messages import SessionMessages
+from api.services.cache_service import LRUCache
+
+
+class CachedChatMessageHistory(BaseChatMessageHistory):
+    """
+    Write-through chat history that keeps the most recent `window` messages
+    of a session in a shared, size-bounded in-process cache. The remote
+    backend is only read on a cache miss; writes go to the backend first and
+    are then appended to the cached window.
+    """
+
+    def __init__(
+        self,
+        backend: BaseChatMessageHistory,
+        cache: LRUCache,
+        key: tuple,
+        window: int,
+    ):
+        self.backend = backend
+        self.cache = cache
+        self.key = key
+        self.window = window
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        cached = self.cache.get(self.key)
+        if cached is None:
+            cached = self.backend.messages[-self.window :]
+            self.cache.set(self.key, cached)
+        return list(cached)
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        cached = self.cache.get(self.key)
+        if cached is None:
+            cached = (await self.backend.aget_messages())[-self.window :]
+            self.cache.set(self.key, cached)
+        return list(cached)
+
+    def append_window(self, messages: Sequence[BaseMessage]):
+        """Extend the cached window without writing to the backend."""
+        # only extend windows that are already cached; a partial window would
+        # hide older messages that still live in the backend
+        cached = self.cache.pop(self.key)
+        if cached is not None:
+            self.cache.set(self.key, (cached + list(messages))[-self.window :])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.backend.add_messages(messages)
+        self.append_window(messages)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        await self.backend.aadd_messages(messages)
+        self.append_window(messages)
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self.cache.pop(self.key)
+
+    async def aclear(self) -> None:
+        await self.backend.aclear()
+        self.cache.pop(self.key)
+
+
+class SQLChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat history read from the `session_messages` rows that are already
+    persisted for every turn, so no second copy is kept in a remote memory
+    service. Only the latest `max_turns` turns are loaded, including turns
+    still waiting in the write-behind queue. Writes and `clear` are no-ops:
+    the turn is stored by `SessionMessage`, and the rows are the session's
+    message log, which is deleted with the session.
+    """
+
+    def __init__(self, session_id: str, max_turns: int):
+        self.session_id = session_id
+        self.max_turns = max_turns
+
+    def _query(self):
+        return (
+            select(
+                SessionMessages.message_id,
+                SessionMessages.content,
+                SessionMessages.timestamp,
+            )
+            .where(SessionMessages.session_id == self.session_id)
+            .order_by(SessionMessages.timestamp.desc())
+            .limit(self.max_turns)
+        )
+
+    def _to_messages(self, rows: Sequence) -> List[BaseMessage]:
+        # a queued row may also have been committed by now
+        turns = {row[0]: (row[2], row[1]) for row in rows}
+        if State.write_behind is not None:
+            for values in State.write_behind.pending_messages(self.session_id):
+                turns[values["message_id"]] = (values["timestamp"], values["content"])
+        latest = sorted(turns.values(), key=lambda turn: turn[0])[-self.max_turns :]
+        messages = []
+        for _, content in latest:
+            messages.append(HumanMessage(content=content.get("question", "")))
+            messages.append(AIMessage(content=content.get("answer", "")))
+        return messages
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with SessionLocal() as db:
+            return self._to_messages(db.execute(self._query()).all())
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(self._query())
+            return self._to_messages(result.all())
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        pass
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
 
 
 class MemoryFactory:
+    # one backend per service is created with its client; per-session
+    # instances are shallow copies that share that client
+    _backends: Dict[str, BaseChatMessageHistory] = {}
+    _lock = threading.Lock()
+    # the TTL bounds how stale a window can get when another worker writes
+    # to the same session
+    _cache = LRUCache(
+        max_size=int(os.getenv("MEMORY_CACHE_SESSIONS", "1024")),
+        ttl=float(os.getenv("MEMORY_CACHE_TTL", "120")),
+    )
+    _window = int(os.getenv("MEMORY_CACHE_WINDOW", "40"))
+
     @staticmethod
     def get_memory_instance(
         memory_service: str,
         session_id: str,
-    ) -> Union[UpstashRedisChatMessageHistory, AstraDBChatMessageHistory]:
+    ) -> CachedChatMessageHistory:
+        backend = MemoryFactory._backends.get(memory_service)
+        if backend is None:
+            with MemoryFactory._lock:
+                backend = MemoryFactory._backends.get(memory_service)
+                if backend is None:
+                    backend = MemoryFactory.__create_backend(memory_service, session_id)
+                    MemoryFactory._backends[memory_service] = backend
+        backend = copy.copy(backend)
+        backend.session_id = session_id
+        return CachedChatMessageHistory(
+            backend=backend,
+            cache=MemoryFactory._cache,
+            key=(memory_service, session_id),
+            window=MemoryFactory._window,
+        )
+
+    @staticmethod
+    def cache_stats() -> Dict:
+        return {**MemoryFactory._cache.stats(), "window": MemoryFactory._window}
+
+    @staticmethod
+    def __create_backend(
+        memory_service: str,
+        session_id: str,
+    ) -> Union[
+        UpstashRedisChatMessageHistory,
+        AstraDBChatMessageHistory,
+        SQLChatMessageHistory,
+    ]:
         if memory_service == MemoryService.UPSTASH.value:
             State.logger.info("Using Upstash Redis memory service.")
             return UpstashRedisChatMessageHistory(
@@ -29,5 +197,11 @@ class MemoryFactory:
                 token=os.environ["ASTRA_TOKEN"],
                 api_endpoint=os.environ["ASTRA_URI"],
             )
+        elif memory_service == MemoryService.SQL.value:
+            State.logger.info("Using SQL memory service.")
+            return SQLChatMessageHistory(
+                session_id=session_id,
+                max_turns=int(os.getenv("SQL_MEMORY_MAX_TURNS", "20")),
+            )
         else:
             raise ValueError("Unsupported memory service.")
@@ -0,0 +1,207 @@
+import asyncio
+import os
+from typing import Dict, List, Sequence
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage
+from api.config.state import State
+from api.database.database import AsyncSessionLocal
+from api.models.session_messages import SessionMessages
+
+
+class WriteBehindQueue:
+    """
+    Write-behind buffer for the persistence work that follows an answer:
+    `session_messages` rows and chat-memory backend writes. Items are
+    drained by one background worker in batches of up to `batch_size`,
+    collected for at most `flush_interval` seconds. Rows of a batch are
+    inserted with a single commit and memory writes of the same session are
+    merged into one call. The buffer is bounded, so producers wait when the
+    worker falls behind instead of growing memory without limit.
+    """
+
+    def __init__(
+        self,
+        max_size: int = None,
+        batch_size: int = None,
+        flush_interval: float = None,
+        retries: int = None,
+    ):
+        self.max_size = max_size or int(os.getenv("WRITE_BEHIND_MAX_SIZE", "1000"))
+        self.batch_size = batch_size or int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "64"))
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50")) / 1000
+        )
+        self.retries = (
+            retries if retries is not None else int(os.getenv("WRITE_BEHIND_RETRIES", "3"))
+        )
+        self._queue = None
+        self._worker = None
+        self._closed = False
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0}
+        # rows not yet written, by session, so history reads can include them
+        self._pending_rows: Dict[str, List[Dict]] = {}
+
+    def _ensure_worker(self):
+        # the queue is bound to the running loop, so it is created lazily
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def put_message(self, values: Dict):
+        """Queue a `SessionMessages` row, given as its column values."""
+        self._pending_rows.setdefault(values["session_id"], []).append(values)
+        await self._put(("message", values))
+
+    def pending_messages(self, session_id: str) -> List[Dict]:
+        """Queued `SessionMessages` rows of `session_id` not yet written."""
+        return list(self._pending_rows.get(session_id, ()))
+
+    async def put_history(
+        self, backend: BaseChatMessageHistory, messages: Sequence[BaseMessage]
+    ):
+        """Queue a write of `messages` to a chat-memory backend."""
+        await self._put(("history", (backend, list(messages))))
+
+    async def _put(self, item):
+        if self._closed:
+            # late writes after shutdown started are persisted inline
+            await self._flush([item])
+            return
+        self._ensure_worker()
+        self._stats["enqueued"] += 1
+        await self._queue.put(item)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stop = False
+        while not stop:
+            item = await self._queue.get()
+            batch = []
+            if item is None:
+                stop = True
+            else:
+                batch.append(item)
+            deadline = loop.time() + self.flush_interval
+            while not stop and len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+            # drain everything left when stopping
+            while stop and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not None:
+                    batch.append(item)
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List):
+        rows = [payload for kind, payload in batch if kind == "message"]
+        # (backend, merged messages, queued items merged into the write)
+        histories: Dict[tuple, list] = {}
+        for kind, payload in batch:
+            if kind != "history":
+                continue
+            backend, messages = payload
+            key = (type(backend), getattr(backend, "session_id", id(backend)))
+            if key in histories:
+                histories[key][1].extend(messages)
+                histories[key][2] += 1
+            else:
+                histories[key] = [backend, list(messages), 1]
+
+        jobs = [self._write_rows(rows)] if rows else []
+        jobs += [
+            self._with_retries(backend.aadd_messages, messages)
+            for backend, messages, _ in histories.values()
+        ]
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        written = failed = 0
+        if rows:
+            done = 0 if isinstance(results[0], Exception) else results[0]
+            written += done
+            failed += len(rows) - done
+            results = results[1:]
+        for result, (_, _, items) in zip(results, histories.values()):
+            if isinstance(result, Exception):
+                failed += items
+            else:
+                written += items
+        for values in rows:
+            pending = self._pending_rows.get(values["session_id"])
+            if pending is not None:
+                pending.remove(values)
+                if not pending:
+                    del self._pending_rows[values["session_id"]]
+        self._stats["batches"] += 1
+        self._stats["written"] += written
+        self._stats["failed"] += failed
+        if failed:
+            State.logger.error(
+                f"Write-behind flush of {len(batch)} item(s) had {failed} failed item(s)."
+            )
+
+    async def _insert_rows(self, rows: List[Dict]):
+        async with AsyncSessionLocal() as db:
+            db.add_all([SessionMessages(**values) for values in rows])
+            await db.commit()
+
+    async def _write_rows(self, rows: List[Dict]) -> int:
+        """
+        Insert `rows` with one commit. If that still fails after the retries,
+        insert them one by one so a bad row only drops itself. Returns the
+        number of rows written.
+        """
+        try:
+            await self._with_retries(self._insert_rows, rows)
+            return len(rows)
+        except Exception:
+            if len(rows) == 1:
+                return 0
+        State.logger.warning(
+            f"Write-behind batch of {len(rows)} rows failed, writing them one by one."
+        )
+        written = 0
+        for values in rows:
+            try:
+                await self._insert_rows([values])
+                written += 1
+            except Exception as e:
+                State.logger.error(
+                    f"Write-behind dropped message {values.get('message_id')}: {e}"
+                )
+        return written
+
+    async def _with_retries(self, func, *args):
+        for attempt in range(self.retries + 1):
+            try:
+                return await func(*args)
+            except Exception as e:
+                if attempt == self.retries:
+                    State.logger.error(f"Write-behind write failed: {e}")
+                    raise
+                await asyncio.sleep(0.1 * 2**attempt)
+
+    async def close(self):
+        """Flush everything still buffered and stop the worker."""
+        self._closed = True
+        if self._worker is not None:
+            await self._queue.put(None)
+            await self._worker
+            self._worker = None
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "max_size": self.max_size,
+        }
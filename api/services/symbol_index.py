@@ -0,0 +1,263 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from api.config.state import State
+
+CLASS_PAGE_PATTERN = re.compile(r"class_([a-z0-9_@]+)\.html$")
+# member definitions as they appear in the class reference tables and
+# descriptions: "void move_and_slide ( )", "body_entered(body: Node2D)",
+# "Vector2 velocity = Vector2(0, 0)", "MOTION_MODE_GROUNDED = 0"
+METHOD_PATTERN = re.compile(
+    r"^[ \t]*(?:[\w\[\]\.]+[ \t]+)?([a-z_][a-z0-9_]*)[ \t]*\(", re.M
+)
+PROPERTY_PATTERN = re.compile(
+    r"^[ \t]*[A-Z][\w\[\]\.]*[ \t]+([a-z_][a-z0-9_]*)[ \t]*(?:=.*|\[.*\])?$", re.M
+)
+# table cells are often extracted one per line
+CELL_PATTERN = re.compile(r"^[ \t]*([a-z][a-z0-9]*_[a-z0-9_]+)[ \t]*$", re.M)
+CONSTANT_PATTERN = re.compile(r"^[ \t]*([A-Z][A-Z0-9]*_[A-Z0-9_]+)[ \t]*=", re.M)
+# identifiers in a question: Class, Class.member, member_name, member()
+QUERY_PATTERN = re.compile(
+    r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)?(?:\s*\(\))?"
+)
+WORD_PATTERN = re.compile(r"\w+")
+
+SYMBOLS_FILE = "symbols.json"
+DOCUMENTS_FILE = "documents.jsonl"
+
+
+class SymbolIndex:
+    """
+    Exact lookup table for the Godot class reference. At ingestion, chunks
+    of `classes/class_*.html` pages are scanned for the class name and the
+    methods, signals, properties and constants they define; each symbol maps
+    to the IDs of the chunks that define it (at most `max_chunks`). The
+    chunks themselves are kept too, so a lookup is a dictionary access with
+    no embedding call or vector search.
+    """
+
+    def __init__(self, path: str, max_chunks: int = 3, max_owners: int = 3):
+        self.path = path
+        self.max_chunks = max_chunks
+        # bare member names defined by more classes than this are ambiguous
+        # (e.g. `get_name`) and only resolve when qualified with a class
+        self.max_owners = max_owners
+        self._lock = threading.RLock()
+        # another process (offline ingestion) may persist a newer table
+        self._reload_interval = float(os.getenv("INDEX_RELOAD_CHECK_S", "1.0"))
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self._symbols: Dict[str, List[str]] = {}
+        self._owners: Dict[str, List[str]] = {}
+        self._class_names: Dict[str, str] = {}
+        self._docs: Dict[str, Tuple[str, Dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def _stored_mtime(self) -> Optional[int]:
+        # the documents file is replaced last by `persist`
+        try:
+            return os.stat(os.path.join(self.path, DOCUMENTS_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+    def stale(self) -> bool:
+        """
+        Whether another process persisted a newer table to `path`. The file
+        is checked at most every INDEX_RELOAD_CHECK_S seconds.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < self._reload_interval:
+            return False
+        self._checked_at = now
+        mtime = self._stored_mtime()
+        return mtime is not None and mtime != self._loaded_mtime
+
+    def reload(self):
+        with self._lock:
+            self._reset()
+            self._load()
+
+    def _load(self):
+        self._loaded_mtime = self._stored_mtime()
+        symbols_path = os.path.join(self.path, SYMBOLS_FILE)
+        if not os.path.exists(symbols_path):
+            return
+        with open(symbols_path, encoding="utf-8") as f:
+            data = json.load(f)
+        self._symbols = data["symbols"]
+        self._owners = data["owners"]
+        self._class_names = data["class_names"]
+        with open(os.path.join(self.path, DOCUMENTS_FILE), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self._docs[record["id"]] = (record["text"], record["metadata"])
+        State.logger.info(f"Loaded symbol index with {len(self._symbols)} symbols.")
+
+    def _link(self, key: str, doc_id: str):
+        ids = self._symbols.setdefault(key, [])
+        if doc_id not in ids and len(ids) < self.max_chunks:
+            ids.append(doc_id)
+
+    def add_documents(self, documents: List[Document], ids: List[str]):
+        with self._lock:
+            for doc_id, doc in zip(ids, documents):
+                match = CLASS_PAGE_PATTERN.search(doc.metadata.get("source", ""))
+                if doc.metadata.get("category") != "classes" or match is None:
+                    continue
+                class_key = match.group(1).replace("_", "")
+                if class_key not in self._class_names:
+                    # the page title carries the class name's casing
+                    for word in WORD_PATTERN.findall(doc.page_content):
+                        if word.lower() == class_key:
+                            self._class_names[class_key] = word
+                            break
+                text = doc.page_content
+                members = (
+                    set(METHOD_PATTERN.findall(text))
+                    | set(PROPERTY_PATTERN.findall(text))
+                    | set(CELL_PATTERN.findall(text))
+                    | set(CONSTANT_PATTERN.findall(text))
+                )
+                if class_key in self._class_names and (
+                    self._class_names[class_key] in text or not members
+                ):
+                    self._link(class_key, doc_id)
+                for member in members:
+                    member = member.lower()
+                    self._link(f"{class_key}.{member}", doc_id)
+                    owners = self._owners.setdefault(member, [])
+                    if class_key not in owners:
+                        owners.append(class_key)
+                if members or class_key in self._symbols:
+                    self._docs[doc_id] = (doc.page_content, dict(doc.metadata))
+
+    def delete(self, ids: List[str]) -> int:
+        with self._lock:
+            return self._remove({doc_id for doc_id in ids if doc_id in self._docs})
+
+    def delete_by_metadata_filter(self, filter: Dict[str, Any]) -> int:
+        if not any(value is not None for value in (filter or {}).values()):
+            return 0
+        with self._lock:
+            return self._remove(
+                {
+                    doc_id
+                    for doc_id, (_, metadata) in self._docs.items()
+                    if self._matches(metadata, filter)
+                }
+            )
+
+    def _remove(self, removed: Set[str]) -> int:
+        for doc_id in removed:
+            del self._docs[doc_id]
+        for key in list(self._symbols):
+            self._symbols[key] = [i for i in self._symbols[key] if i not in removed]
+            if not self._symbols[key]:
+                del self._symbols[key]
+        for member in list(self._owners):
+            self._owners[member] = [
+                owner
+                for owner in self._owners[member]
+                if f"{owner}.{member}" in self._symbols
+            ]
+            if not self._owners[member]:
+                del self._owners[member]
+        return len(removed)
+
+    @staticmethod
+    def _matches(metadata: Dict, filter: Optional[Dict[str, Any]]) -> bool:
+        return all(
+            value is None or metadata.get(field) == value
+            for field, value in (filter or {}).items()
+        )
+
+    def _lookup(self, token: str, classes: List[str]) -> List[str]:
+        called = token.endswith(")")
+        token = token.replace("(", "").replace(")", "").strip()
+        if "." in token:
+            owner, member = token.lower().split(".", 1)
+            return self._symbols.get(f"{owner}.{member}", [])
+        key = token.lower()
+        if key in self._class_names and self._class_names[key] == token:
+            return self._symbols.get(key, [])
+        owners = self._owners.get(key, [])
+        # a bare member only counts when it looks like code
+        if not owners or not ("_" in token or called):
+            return []
+        owned = [owner for owner in owners if owner in classes]
+        if owned:
+            owners = owned
+        elif len(owners) > self.max_owners:
+            return []
+        return [
+            doc_id for owner in owners for doc_id in self._symbols[f"{owner}.{key}"]
+        ]
+
+    def resolve(
+        self, question: str, filter: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Document], int]:
+        """
+        Chunks of the symbols recognized in `question`, in question order,
+        and the number of other words in the question (a small number means
+        it is a plain API lookup).
+        """
+        with self._lock:
+            if not self._symbols:
+                return [], 0
+            tokens = QUERY_PATTERN.findall(question)
+            classes = [
+                token.lower()
+                for token in tokens
+                if self._class_names.get(token.lower()) == token
+            ]
+            doc_ids, symbol_words = [], 0
+            for token in tokens:
+                ids = self._lookup(token, classes)
+                if ids:
+                    symbol_words += len(WORD_PATTERN.findall(token))
+                for doc_id in ids:
+                    if doc_id not in doc_ids:
+                        doc_ids.append(doc_id)
+            docs = [
+                Document(id=doc_id, page_content=text, metadata=metadata)
+                for doc_id in doc_ids
+                for text, metadata in [self._docs[doc_id]]
+                if self._matches(metadata, filter)
+            ]
+            return docs, len(WORD_PATTERN.findall(question)) - symbol_words
+
+    def persist(self):
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            symbols_path = os.path.join(self.path, SYMBOLS_FILE)
+            with open(symbols_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "symbols": self._symbols,
+                        "owners": self._owners,
+                        "class_names": self._class_names,
+                    },
+                    f,
+                )
+            documents_path = os.path.join(self.path, DOCUMENTS_FILE)
+            with open(documents_path + ".tmp", "w", encoding="utf-8") as f:
+                for doc_id, (text, metadata) in self._docs.items():
+                    f.write(
+                        json.dumps({"id": doc_id, "text": text, "metadata": metadata})
+                        + "\n"
+                    )
+            os.replace(symbols_path + ".tmp", symbols_path)
+            os.replace(documents_path + ".tmp", documents_path)
+            self._loaded_mtime = self._stored_mtime()
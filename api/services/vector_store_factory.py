@@ -7,6 +7,7 @@ from pymilvus import DataType, MilvusClient
 
 from ..enums.enums import VectorStoreService
 from api.config.state import State
+from api.services.local_vector_store import LocalVectorStore
 
 
 class VectorStoreFactory:
@@ -14,7 +15,7 @@ class VectorStoreFactory:
     def get_vectorstore(
         vectorstore_service: str,
         embeddings,
-    ) -> Union[AstraDBVectorStore, Milvus]:
+    ) -> Union[AstraDBVectorStore, Milvus, LocalVectorStore]:
         if vectorstore_service == VectorStoreService.ASTRADB.value:
             State.logger.info("Using AstraDB")
             try:
@@ -81,5 +82,16 @@ class VectorStoreFactory:
                 metadata_field="metadata",
                 vector_field="vector",
             )
+        elif vectorstore_service == VectorStoreService.LOCAL.value:
+            State.logger.info("Using local vector store")
+            return LocalVectorStore(
+                embedding=embeddings,
+                path=os.getenv("LOCAL_VECTOR_STORE_PATH", ".cache/local_vector_store"),
+                dtype=os.getenv("LOCAL_VECTOR_STORE_DTYPE", "float32"),
+                ivf_lists=int(os.getenv("LOCAL_VECTOR_STORE_IVF_LISTS", "0")),
+                nprobe=int(os.getenv("LOCAL_VECTOR_STORE_NPROBE", "8")),
+                quantization=os.getenv("LOCAL_VECTOR_STORE_QUANTIZATION"),
+                rescore_factor=int(os.getenv("LOCAL_VECTOR_STORE_RESCORE_FACTOR", "40")),
+            )
         else:
             raise ValueError("Unsupported vectorstore service")
@@ -0,0 +1,22 @@
+import hashlib
+from typing import List
+
+from langchain_core.documents import Document
+
+
+def chunk_id(doc: Document) -> str:
+    """Deterministic chunk ID: sha256 of the source, start offset and content."""
+    key = "\x00".join(
+        [
+            str(doc.metadata.get("source", "")),
+            str(doc.metadata.get("start_index", "")),
+            doc.page_content,
+        ]
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def assign_chunk_ids(docs: List[Document]) -> List[Document]:
+    for doc in docs:
+        doc.id = chunk_id(doc)
+    return docs
@@ -0,0 +1,65 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide bounded executor used for blocking work
+    (CPU-bound model calls, sync SDK clients) issued from async code.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "4")),
+                    thread_name_prefix="blocking",
+                )
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable on the bounded executor without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+
+async def gather_cancelling(*aws):
+    """
+    Await independent awaitables concurrently like `asyncio.gather`, but
+    cancel the ones still running as soon as one fails and re-raise that
+    failure.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def timed(timings: Dict[str, float], name: str, aw):
+    """Await `aw` and record its wall time in milliseconds under `name`."""
+    start = time.perf_counter()
+    try:
+        return await aw
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -1,41 +1,139 @@
+import multiprocessing
+import os
+import queue
 from datasets import load_dataset
-from typing import List
+from datasets.distributed import split_dataset_by_node
+from typing import Iterator, List
+import pandas as pd
 from langchain.schema import Document
 from langchain.text_splitter import CharacterTextSplitter
 from api.config.state import State
-import hashlib
+from api.utils.chunk_ids import assign_chunk_ids
+
+
+def _read_shard(dataset_name: str, rank: int, world_size: int, outbox):
+    # runs in a worker process; chunks go back in record batches and a
+    # final None (or the error message) marks the end of the shard
+    try:
+        reader = ConversationsReader(workers=1)
+        dataset = split_dataset_by_node(
+            reader.stream(dataset_name), rank=rank, world_size=world_size
+        )
+        for batch in dataset.iter(batch_size=reader.batch_size):
+            outbox.put(reader.split_batch(batch, dataset_name))
+        outbox.put(None)
+    except Exception as e:
+        outbox.put(str(e))
 
 
 class ConversationsReader:
-    def __init__(self):
+    def __init__(self, workers: int = None, prefetch: int = None):
         self.loader = None
         self.text_splitter = CharacterTextSplitter(
             separator="\n",
             chunk_size=1000,
             chunk_overlap=200,
+            # lets retrieval stitch overlapping neighbours back together
+            add_start_index=True,
+        )
+        self.batch_size = int(os.getenv("CONVERSATIONS_BATCH_SIZE", "1000"))
+        self.workers = workers or int(
+            os.getenv("CONVERSATIONS_READER_WORKERS", str(os.cpu_count() or 1))
         )
+        # record batches buffered per worker, which bounds memory
+        self.prefetch = prefetch or int(os.getenv("CONVERSATIONS_READER_PREFETCH", "4"))
         State.logger.info("ParquetReader initialized.")
 
-    def load(self, dataset_name: str):
+    @staticmethod
+    def stream(dataset_name: str):
+        # pandas batches render values (e.g. list columns as numpy arrays)
+        # exactly like the rows of `to_pandas()` did, so chunk IDs and the
+        # ingestion manifests of earlier runs stay valid
+        return load_dataset(dataset_name, split="train", streaming=True).with_format(
+            "pandas"
+        )
+
+    def split_batch(self, batch: pd.DataFrame, dataset_name: str) -> List[Document]:
+        """
+        Format a record batch column-wise into one message per row and split
+        the messages into chunks with content-hash IDs.
+        """
+        columns = [
+            [f"# {key}\n{val}" for val in batch[key].tolist()] for key in batch.columns
+        ]
+        messages = ["\n".join(fields) for fields in zip(*columns)]
+        docs = self.text_splitter.create_documents(
+            messages,
+            metadatas=[
+                {"category": "conversation", "source": dataset_name} for _ in messages
+            ],
+        )
+        return assign_chunk_ids(docs)
+
+    def __read_shards(self, dataset_name: str, world_size: int) -> Iterator[Document]:
+        context = multiprocessing.get_context()
+        outbox = context.Queue(maxsize=world_size * self.prefetch)
+        workers = [
+            context.Process(
+                target=_read_shard,
+                args=(dataset_name, rank, world_size, outbox),
+                daemon=True,
+            )
+            for rank in range(world_size)
+        ]
+        for worker in workers:
+            worker.start()
         try:
-            data = load_dataset(dataset_name, split="train").to_pandas()
-            docs: List[Document] = []
-            for _, row in data.iterrows():
-                message = "\n".join(
-                    f"# {key}\n{val}" for key, val in row.to_dict().items()
-                )
-                docs.append(
-                    Document(
-                        page_content=message,
-                        id=hashlib.sha256(message.encode()).hexdigest(),
-                        metadata={
-                            "category": "conversation",
-                            "source": dataset_name,
-                        },
-                    )
+            running = world_size
+            while running:
+                try:
+                    item = outbox.get(timeout=1.0)
+                except queue.Empty:
+                    # a worker that is killed (OOM, a crash in the Arrow
+                    # readers) never posts its end marker
+                    dead = [w.exitcode for w in workers if w.exitcode not in (None, 0)]
+                    if dead:
+                        raise Exception(f"Shard reader exited with code {dead[0]}")
+                    continue
+                if item is None:
+                    running -= 1
+                elif isinstance(item, str):
+                    raise Exception(item)
+                else:
+                    yield from item
+            for worker in workers:
+                worker.join()
+        finally:
+            # the consumer may stop early, or a shard may have failed
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+    def lazy_load(self, dataset_name: str) -> Iterator[Document]:
+        """
+        Stream the train split of `dataset_name` in record batches and yield
+        its chunks as each batch is split, without materializing the
+        dataset. With more than one worker, the dataset's shards are read
+        and split by worker processes.
+        """
+        try:
+            dataset = self.stream(dataset_name)
+            world_size = min(self.workers, dataset.n_shards)
+            # with uneven shards every worker would read the whole dataset
+            while dataset.n_shards % world_size:
+                world_size -= 1
+            if world_size > 1:
+                State.logger.info(
+                    f"Reading {dataset.n_shards} shards of {dataset_name} "
+                    f"with {world_size} workers."
                 )
-            docs = self.text_splitter.split_documents(docs)
-            return docs
+                yield from self.__read_shards(dataset_name, world_size)
+                return
+            for batch in dataset.iter(batch_size=self.batch_size):
+                yield from self.split_batch(batch, dataset_name)
         except Exception as e:
             State.logger.error(f"Error loading dataset {dataset_name}: {e}")
             raise Exception(f"Error loading dataset {dataset_name}: {e}")
+
+    def load(self, dataset_name: str):
+        return list(self.lazy_load(dataset_name))
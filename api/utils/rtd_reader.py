@@ -1,51 +1,74 @@
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator, List, Optional, Set, Tuple
 from langchain.document_loaders.readthedocs import ReadTheDocsLoader
+from langchain.schema import Document
 from langchain.text_splitter import CharacterTextSplitter
 from api.config.state import State
+from api.utils.chunk_ids import assign_chunk_ids
+
+CATEGORIES = [
+    "about",
+    "classes",
+    "community",
+    "engine_details",
+    "getting_started",
+    "tutorials",
+]
+PATTERNS = ("*.htm", "*.html")
+
+# one reader per pool process, created on its first file
+_worker_reader = None
+
+
+def _split_file(path: str) -> Tuple[str, Optional[List[Document]]]:
+    global _worker_reader
+    if _worker_reader is None:
+        _worker_reader = ReadTheDocsReader(workers=1)
+    return path, _worker_reader._read_file(path)
 
 
 class ReadTheDocsReader:
-    def __init__(self):
-        self.loader = None
+    def __init__(self, workers: int = None, prefetch: int = None):
+        # the loader is only used for its HTML cleaning, pages are read here
+        self.loader = ReadTheDocsLoader(
+            path=".",
+            exclude_links_ratio=0.5,
+        )
         self.text_splitter = CharacterTextSplitter(
             separator="\n",
             chunk_size=1000,
             chunk_overlap=200,
+            # lets retrieval stitch overlapping neighbours back together
+            add_start_index=True,
         )
-        State.logger.info("ReadTheDocsReader initialized.")
-
-    def __load_directory(self, directory: str):
-        self.loader = ReadTheDocsLoader(
-            path=directory,
-            exclude_links_ratio=0.5,
+        self.workers = workers or int(
+            os.getenv("RTD_READER_WORKERS", str(os.cpu_count() or 1))
         )
-        docs = self.loader.load()
-        docs = self.__apply_metadata(docs)
-        docs = self.text_splitter.split_documents(docs)
-        return docs
+        # files in flight per worker, which bounds the parsed pages in memory
+        self.prefetch = prefetch or int(os.getenv("RTD_READER_PREFETCH", "4"))
+        # pages of the last `lazy_load` that could not be read or parsed; their
+        # chunks from earlier runs must be kept, not treated as vanished
+        self.failed_sources: Set[str] = set()
+        State.logger.info("ReadTheDocsReader initialized.")
 
-    def __apply_metadata(self, docs):
-        categories = [
-            "about",
-            "classes",
-            "community",
-            "engine_details",
-            "getting_started",
-            "tutorials",
-        ]
-        for doc in docs:
-            category, sub_category, tags = self.__extract_categories(doc.metadata["source"])
-            if category in categories:
-                doc.metadata["category"] = category
-            if sub_category:
-                doc.metadata["sub_category"] = sub_category
-            if tags:
-                doc.metadata["tags"] = tags
-        return docs
+    def __apply_metadata(self, doc: Document) -> Document:
+        category, sub_category, tags = self.__extract_categories(doc.metadata["source"])
+        if category in CATEGORIES:
+            doc.metadata["category"] = category
+        if sub_category:
+            doc.metadata["sub_category"] = sub_category
+        if tags:
+            doc.metadata["tags"] = tags
+        return doc
 
     def __extract_categories(self, path):
-        parts = path.split("latest/")
+        # local mirrors and the live site (`/en/stable/...`) alike
+        parts = re.split(r"(?:latest|stable)/", path, maxsplit=1)
         if len(parts) != 2:
-            return None, None
+            return None, None, None
         path_after_latest = parts[1].strip("/")
 
         components = path_after_latest.split("/")
@@ -64,9 +87,77 @@ class ReadTheDocsReader:
             ],
         )
 
+    def split_page(self, html: str, source: str) -> List[Document]:
+        """
+        Clean one HTML page, tag it with its category and split it into
+        chunks with content-hash IDs.
+        """
+        text = self.loader._clean_data(html)
+        if not text:
+            return []
+        doc = self.__apply_metadata(Document(page_content=text, metadata={"source": source}))
+        return assign_chunk_ids(self.text_splitter.split_documents([doc]))
+
+    def _read_file(self, path: str) -> Optional[List[Document]]:
+        """Chunks of the page at `path`, or None if it could not be read."""
+        try:
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                return self.split_page(f.read(), source=path)
+        except Exception as e:
+            State.logger.error(f"Error parsing {path}: {e}")
+            return None
+
+    def lazy_load(self, directory: str) -> Iterator[Document]:
+        """
+        Yield the chunks of every page under `directory` as pages are parsed.
+        With more than one worker, pages are parsed and split in a process
+        pool with at most `workers * prefetch` files in flight, and chunks
+        are yielded in completion order. Pages that fail are skipped and
+        collected in `failed_sources`.
+        """
+        # cleared in place: callers hold on to the set while this streams
+        self.failed_sources.clear()
+        files = (
+            str(path)
+            for pattern in PATTERNS
+            for path in Path(directory).rglob(pattern)
+            if not path.is_dir()
+        )
+        if self.workers <= 1:
+            results = ((path, self._read_file(path)) for path in files)
+        else:
+            results = self.__read_in_pool(files)
+        for path, docs in results:
+            if docs is None:
+                self.failed_sources.add(path)
+                continue
+            yield from docs
+        if self.failed_sources:
+            State.logger.warning(
+                f"{len(self.failed_sources)} pages under {directory} failed to parse."
+            )
+
+    def __read_in_pool(self, files: Iterator[str]):
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            try:
+                for path in files:
+                    pending.add(pool.submit(_split_file, path))
+                    if len(pending) >= self.workers * self.prefetch:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                # the consumer may stop early
+                for future in pending:
+                    future.cancel()
+
     def load(self, directory: str):
         """
         Load the ReadTheDocs documentation from the specified directory.
         """
-        docs = self.__load_directory(directory)
-        return docs
+        return list(self.lazy_load(directory))
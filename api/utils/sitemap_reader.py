@@ -0,0 +1,235 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+from typing import Dict, Iterable, Iterator, List, Set
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+import httpx
+from langchain.schema import Document
+
+from api.config.state import State
+from api.utils.rtd_reader import ReadTheDocsReader
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+class SitemapReader:
+    """
+    Crawls the pages listed by a sitemap (following sitemap indexes) with a
+    pooled async HTTP client and at most SITEMAP_PER_HOST_CONCURRENCY
+    requests per host. The ETag and Last-Modified of every page are kept
+    per sitemap, and later runs send conditional requests, so a page that
+    did not change costs a 304. Fetched pages go through the split and
+    metadata path of ReadTheDocsReader.
+
+    Pages answered with 304, or that could not be fetched, are collected in
+    `unchanged`; their chunks from earlier runs stay in the index.
+    """
+
+    def __init__(self, sitemap_url: str, splitter: ReadTheDocsReader = None):
+        self.sitemap_url = sitemap_url
+        self.splitter = splitter or ReadTheDocsReader(workers=1)
+        self.max_connections = int(os.getenv("SITEMAP_MAX_CONNECTIONS", "32"))
+        self.per_host = int(os.getenv("SITEMAP_PER_HOST_CONCURRENCY", "8"))
+        self.timeout = float(os.getenv("SITEMAP_TIMEOUT_S", "30"))
+        self.queue_size = int(os.getenv("SITEMAP_QUEUE_SIZE", "64"))
+        digest = hashlib.sha256(sitemap_url.encode("utf-8")).hexdigest()[:16]
+        self.file = os.path.join(
+            os.getenv("SITEMAP_CACHE_PATH", ".cache/sitemap_validators"),
+            f"{digest}.json",
+        )
+        self.validators: Dict[str, Dict] = {}
+        if os.path.exists(self.file):
+            with open(self.file, encoding="utf-8") as f:
+                self.validators = json.load(f)["pages"]
+        # validators seen in this run, saved once its chunks are ingested
+        self.pages: Dict[str, Dict] = {}
+        self.unchanged: Set[str] = set()
+        self.stats = {"pages": 0, "fetched": 0, "not_modified": 0, "failed": 0}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stop = threading.Event()
+
+    async def _get(self, client: httpx.AsyncClient, url: str, headers: Dict = None):
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with semaphore:
+            return await client.get(url, headers=headers)
+
+    async def _page_urls(
+        self, client: httpx.AsyncClient, sitemap_url: str, seen: Set[str]
+    ) -> List[str]:
+        if sitemap_url in seen:
+            return []
+        seen.add(sitemap_url)
+        response = await self._get(client, sitemap_url)
+        response.raise_for_status()
+        content = response.content
+        if content[:2] == b"\x1f\x8b":
+            content = gzip.decompress(content)
+        root = ElementTree.fromstring(content)
+        locs = [
+            child.text.strip()
+            for entry in root
+            for child in entry
+            if _local_name(child.tag) == "loc" and child.text
+        ]
+        if _local_name(root.tag) != "sitemapindex":
+            return locs
+        nested = await asyncio.gather(
+            *(self._page_urls(client, loc, seen) for loc in locs)
+        )
+        return [url for urls in nested for url in urls]
+
+    async def _put(self, outbox: queue.Queue, item):
+        # the consumer is a sync generator; a full queue holds the crawl back
+        while not self._stop.is_set():
+            try:
+                await asyncio.to_thread(outbox.put, item, True, 0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _conditional_headers(self, url: str, known_sources: Set[str]) -> Dict:
+        # pages whose chunks are not in the index are fetched in full
+        cached = self.validators.get(url) if url in known_sources else None
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    async def _fetch_page(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        known_sources: Set[str],
+        slots: asyncio.Semaphore,
+        outbox: queue.Queue,
+    ):
+        async with slots:
+            if self._stop.is_set():
+                return
+            try:
+                response = await self._get(
+                    client, url, self._conditional_headers(url, known_sources)
+                )
+            except httpx.HTTPError as e:
+                State.logger.warning(f"Error fetching {url}: {e}")
+                self.stats["failed"] += 1
+                self.unchanged.add(url)
+                if url in self.validators:
+                    self.pages[url] = self.validators[url]
+                return
+            if response.status_code == 304:
+                self.stats["not_modified"] += 1
+                self.unchanged.add(url)
+                self.pages[url] = self.validators.get(url, {})
+            elif response.status_code == 200:
+                self.stats["fetched"] += 1
+                self.pages[url] = {
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                }
+                await self._put(outbox, (url, response.text))
+            elif response.status_code in (404, 410):
+                # gone: its chunks are deleted with the other vanished ones
+                State.logger.info(f"{url} is gone ({response.status_code}).")
+            else:
+                State.logger.warning(f"Error fetching {url}: HTTP {response.status_code}")
+                self.stats["failed"] += 1
+                self.unchanged.add(url)
+                if url in self.validators:
+                    self.pages[url] = self.validators[url]
+
+    async def _crawl(self, known_sources: Set[str], outbox: queue.Queue):
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+        async with httpx.AsyncClient(
+            limits=limits,
+            timeout=self.timeout,
+            follow_redirects=True,
+            transport=httpx.AsyncHTTPTransport(limits=limits, retries=2),
+        ) as client:
+            urls = list(dict.fromkeys(await self._page_urls(client, self.sitemap_url, set())))
+            self.stats["pages"] = len(urls)
+            State.logger.info(f"Sitemap {self.sitemap_url} lists {len(urls)} pages.")
+            # bounds the pages held in memory while the consumer catches up
+            slots = asyncio.Semaphore(self.max_connections)
+            await asyncio.gather(
+                *(
+                    self._fetch_page(client, url, known_sources, slots, outbox)
+                    for url in urls
+                )
+            )
+
+    def lazy_load(self, known_sources: Iterable[str] = ()) -> Iterator[Document]:
+        """
+        Crawl the sitemap and yield the chunks of every fetched page as it
+        arrives. Validators are only used for `known_sources`, the pages
+        whose chunks are already in the index.
+        """
+        outbox = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        known_sources = set(known_sources)
+
+        def crawl():
+            try:
+                asyncio.run(self._crawl(known_sources, outbox))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                while not self._stop.is_set():
+                    try:
+                        outbox.put(None, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+
+        thread = threading.Thread(target=crawl, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = outbox.get()
+                if item is None:
+                    break
+                url, html = item
+                try:
+                    docs = self.splitter.split_page(html, source=url)
+                except Exception as e:
+                    # like a failed fetch: keep its chunks, fetch it again next run
+                    State.logger.error(f"Error parsing {url}: {e}")
+                    self.stats["failed"] += 1
+                    self.unchanged.add(url)
+                    self.pages.pop(url, None)
+                    continue
+                yield from docs
+        finally:
+            self._stop.set()
+        thread.join()
+        if errors:
+            State.logger.error(f"Error crawling sitemap {self.sitemap_url}: {errors[0]}")
+            raise Exception(f"Error crawling sitemap {self.sitemap_url}: {errors[0]}")
+        State.logger.info(f"Crawled {self.sitemap_url}: {self.stats}")
+
+    def save(self, exclude: Iterable[str] = ()):
+        """
+        Store the validators of this run, except for the pages in `exclude`
+        (whose chunks failed to upload), so those are fetched again.
+        """
+        exclude = set(exclude)
+        pages = {url: page for url, page in self.pages.items() if url not in exclude}
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        with open(self.file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"sitemap": self.sitemap_url, "pages": pages}, f)
+        os.replace(self.file + ".tmp", self.file)
+        self.validators = pages
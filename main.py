@@ -13,14 +13,25 @@ from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from api.database.database import Base, engine, DatabaseConnectionError
+from api.database.database import (
+    Base,
+    engine,
+    async_engine,
+    DatabaseConnectionError,
+)
+from api.models.session_messages import SessionMessages
 from api.router import query as query_router
 from api.router import session as session_router
 from api.router import source as source_router
 from api.services.logger_service import LoggerService
 from api.config.state import State
+from api.services.history_service import HistoryService
+from api.utils.concurrency import shutdown_executor
 
 Base.metadata.create_all(bind=engine)
+# create_all skips indexes of tables that already exist
+for index in SessionMessages.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
 
 
 @asynccontextmanager
@@ -28,6 +39,10 @@ async def lifespan(app: FastAPI):
     state = State()
     try:
         state.initialize_embeddings_and_vectorstore()
+        state.initialize_caches()
+        state.initialize_lexical_index()
+        state.initialize_symbol_index()
+        state.initialize_write_behind()
         state.initialize_controllers()
         state.logger.info("Application startup complete.")
         yield
@@ -35,6 +50,11 @@ async def lifespan(app: FastAPI):
         qc = getattr(app.state, "query_chain", None)
         if qc is not None:
             pass
+        if State.write_behind is not None:
+            await State.write_behind.close()
+        await HistoryService.drain()
+        shutdown_executor()
+        await async_engine.dispose()
         state.logger.info("Application shutdown complete.")
 
 
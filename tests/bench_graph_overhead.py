@@ -0,0 +1,133 @@
+"""
+Micro-benchmark for the per-request LangGraph overhead of the query pipeline.
+
+Compares the old behaviour (build + compile a StateGraph on every request and
+carry the heavyweight dependencies in graph state) with the current one
+(graph compiled once, dependencies injected through the runtime context).
+The nodes are no-ops with the same shape as retrieve/generate/
+add_message_history so only the graph machinery is measured.
+
+Usage: python tests/bench_graph_overhead.py [iterations]
+"""
+
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, List
+
+from langgraph.graph import END, START, StateGraph
+from langgraph.runtime import Runtime
+from typing_extensions import TypedDict
+
+
+class HeavyState(TypedDict):
+    question: str
+    context: List[str]
+    chat_history: str
+    answer: str
+    model: Any
+    memory_instance: Any
+    vector_store: Any
+    prompt: Any
+
+
+class SlimState(TypedDict):
+    question: str
+    context: List[str]
+    chat_history: str
+    answer: str
+
+
+@dataclass
+class Context:
+    model: Any
+    memory_instance: Any
+    vector_store: Any
+    prompt: Any
+
+
+class Dependency:
+    """Stand-in for a client object with a non-trivial attribute payload."""
+
+    def __init__(self):
+        self.payload = {f"k{i}": list(range(32)) for i in range(64)}
+
+
+DOCS = ["lorem ipsum " * 80] * 10
+
+
+async def heavy_retrieve(state: HeavyState):
+    state["context"] = DOCS
+    state["chat_history"] = ""
+    return state
+
+
+async def heavy_generate(state: HeavyState):
+    state["answer"] = "answer"
+    return state
+
+
+async def heavy_add_message_history(state: HeavyState):
+    return state
+
+
+async def retrieve(state: SlimState, runtime: Runtime[Context]):
+    return {"context": DOCS, "chat_history": ""}
+
+
+async def generate(state: SlimState, runtime: Runtime[Context]):
+    return {"answer": "answer"}
+
+
+async def add_message_history(state: SlimState, runtime: Runtime[Context]):
+    return {}
+
+
+def build_per_request():
+    graph_builder = StateGraph(HeavyState).add_sequence(
+        [heavy_retrieve, heavy_generate, heavy_add_message_history]
+    )
+    graph_builder.add_edge(START, "heavy_retrieve")
+    graph_builder.add_edge("heavy_add_message_history", END)
+    return graph_builder.compile()
+
+
+def build_once():
+    graph_builder = StateGraph(SlimState, context_schema=Context).add_sequence(
+        [retrieve, generate, add_message_history]
+    )
+    graph_builder.add_edge(START, "retrieve")
+    graph_builder.add_edge("add_message_history", END)
+    return graph_builder.compile()
+
+
+async def bench(iterations: int):
+    deps = dict(
+        model=Dependency(),
+        memory_instance=Dependency(),
+        vector_store=Dependency(),
+        prompt=Dependency(),
+    )
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        graph = build_per_request()
+        await graph.ainvoke({"question": "How do I create a node?", **deps})
+    before = (time.perf_counter() - start) / iterations
+
+    graph = build_once()
+    context = Context(**deps)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await graph.ainvoke({"question": "How do I create a node?"}, context=context)
+    after = (time.perf_counter() - start) / iterations
+
+    print(f"iterations:                       {iterations}")
+    print(f"compile per request (before):     {before * 1e3:8.3f} ms/request")
+    print(f"compiled once + context (after):  {after * 1e3:8.3f} ms/request")
+    print(f"speedup:                          {before / after:8.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
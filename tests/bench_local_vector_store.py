@@ -0,0 +1,107 @@
+"""
+Recall-versus-speed report for the embedded LocalVectorStore.
+
+Builds stores over a synthetic clustered corpus (random topic centroids plus
+noise, which is closer to real embeddings than uniform noise) in a temporary
+directory, one per storage option (float32/float16, int8/binary quantization
+with exact rescoring, IVF), and reports the bytes per vector that stay
+resident, per-query latency with and without a category filter, and
+recall@k against an exact float32 flat scan.
+
+Usage: python -m tests.bench_local_vector_store [n_vectors] [dim] [queries]
+"""
+
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from api.services.local_vector_store import LocalVectorStore
+
+K = 10
+CATEGORIES = ["tutorials", "classes", "getting_started", "engine_details"]
+
+
+def make_corpus(n: int, dim: int, topics: int = 256, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    labels = rng.integers(0, topics, n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    queries = centers[rng.integers(0, topics, 200)] + 0.6 * rng.standard_normal(
+        (200, dim)
+    ).astype(np.float32)
+    metadatas = [{"category": CATEGORIES[i % len(CATEGORIES)]} for i in range(n)]
+    return vectors, queries, metadatas
+
+
+def build(path, vectors, metadatas, **kwargs):
+    store = LocalVectorStore(embedding=None, path=path, **kwargs)
+    step = 10000
+    for i in range(0, len(vectors), step):
+        store.add_embeddings(
+            texts=[f"doc {j}" for j in range(i, min(i + step, len(vectors)))],
+            embeddings=vectors[i : i + step],
+            metadatas=metadatas[i : i + step],
+            ids=[str(j) for j in range(i, min(i + step, len(vectors)))],
+        )
+    start = time.perf_counter()
+    store.persist()
+    return store, time.perf_counter() - start
+
+
+def run(store, queries, filter=None):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(query, k=K, filter=filter)
+        latencies.append(time.perf_counter() - start)
+        results.append({doc.id for doc in docs})
+    latencies = np.asarray(latencies) * 1e3
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), results
+
+
+def recall(results, truth):
+    return np.mean([len(r & t) / len(t) for r, t in zip(results, truth)])
+
+
+def bench(n: int, dim: int, n_queries: int):
+    vectors, queries, metadatas = make_corpus(n, dim)
+    queries = queries[:n_queries]
+    configs = {
+        "flat float32": dict(),
+        "flat float16": dict(dtype="float16"),
+        "int8": dict(quantization="int8"),
+        "binary": dict(quantization="binary"),
+        "binary x10": dict(quantization="binary", rescore_factor=10),
+        "ivf float32": dict(ivf_lists=max(16, int(np.sqrt(n))), nprobe=8),
+        "ivf binary": dict(
+            ivf_lists=max(16, int(np.sqrt(n))), nprobe=8, quantization="binary"
+        ),
+        # every list probed: must match the flat int8 recall
+        "ivf int8 all": dict(ivf_lists=16, nprobe=16, quantization="int8"),
+    }
+    print(f"vectors: {n}  dim: {dim}  queries: {len(queries)}  k: {K}")
+    print(
+        f"{'config':<16}{'B/vec':>7}{'persist s':>10}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'recall':>8}{'filt p50':>10}{'filt recall':>12}"
+    )
+    truth = truth_filtered = None
+    for name, kwargs in configs.items():
+        with tempfile.TemporaryDirectory() as path:
+            store, persist_time = build(path, vectors, metadatas, **kwargs)
+            p50, p95, results = run(store, queries)
+            fp50, _, filtered = run(store, queries, {"category": "classes"})
+            if truth is None:
+                truth, truth_filtered = results, filtered
+            print(
+                f"{name:<16}{store.stats()['resident_bytes_per_vector']:>7}"
+                f"{persist_time:>10.2f}{p50:>9.2f}{p95:>9.2f}"
+                f"{recall(results, truth):>8.3f}{fp50:>10.2f}"
+                f"{recall(filtered, truth_filtered):>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    bench(*(args + [50000, 1024, 200][len(args) :]))
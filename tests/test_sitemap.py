@@ -0,0 +1,60 @@
+import sys
+
+sys.path.append("..")
+
+import os
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from api.utils.sitemap_reader import SitemapReader
+
+# a local stand-in for the docs site: SimpleHTTPRequestHandler sends
+# Last-Modified and answers If-Modified-Since with 304
+root = tempfile.mkdtemp()
+os.environ["SITEMAP_CACHE_PATH"] = os.path.join(root, "validators")
+site = os.path.join(root, "site")
+os.makedirs(os.path.join(site, "en", "stable", "classes"))
+server = ThreadingHTTPServer(
+    ("127.0.0.1", 0), partial(SimpleHTTPRequestHandler, directory=site)
+)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_port}"
+
+pages = []
+for i in range(20):
+    path = f"en/stable/classes/class_node{i}.html"
+    with open(os.path.join(site, path), "w") as f:
+        body = "\n".join(f"<p>Node{i} paragraph {j}.</p>" for j in range(50))
+        f.write(f"<html><body><div role='main'>{body}</div></body></html>")
+    pages.append(f"{base}/{path}")
+for n, half in enumerate((pages[:10], pages[10:])):
+    urls = "".join(f"<url><loc>{url}</loc></url>" for url in half)
+    with open(os.path.join(site, f"sitemap-{n}.xml"), "w") as f:
+        f.write(
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f"{urls}</urlset>"
+        )
+with open(os.path.join(site, "sitemap.xml"), "w") as f:
+    f.write(
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"<sitemap><loc>{base}/sitemap-0.xml</loc></sitemap>"
+        f"<sitemap><loc>{base}/sitemap-1.xml</loc></sitemap>"
+        "</sitemapindex>"
+    )
+
+reader = SitemapReader(f"{base}/sitemap.xml")
+docs = list(reader.lazy_load())
+reader.save()
+print(reader.stats, len(docs), "chunks")
+assert reader.stats["fetched"] == 20 and docs
+assert docs[0].metadata["category"] == "classes"
+
+# second run: every page is unchanged and answered with 304
+reader = SitemapReader(f"{base}/sitemap.xml")
+docs = list(reader.lazy_load(known_sources=pages))
+print(reader.stats, len(docs), "chunks")
+assert reader.stats["not_modified"] == 20 and not docs
+assert reader.unchanged == set(pages)
+server.shutdown()